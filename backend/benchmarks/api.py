@@ -0,0 +1,224 @@
+"""
+Нагрузочные замеры API через настоящий URLconf и тестовый клиент Django.
+
+Запуск из каталога backend:
+    python -m benchmarks.api --recipes 5000 --repeat 50 --output run.json
+
+Данные создаются в отдельной тестовой БД. Для каждого сценария
+считаются пропускная способность, p50/p95 времени ответа и число
+SQL-запросов; результат выводится в JSON, чтобы сравнивать прогоны
+между коммитами.
+"""
+import argparse
+import json
+import subprocess
+import sys
+from collections import Counter
+from itertools import cycle
+from statistics import median, quantiles
+from time import perf_counter
+
+from benchmarks.database import setup, test_database
+from benchmarks.seed import add_arguments, seed
+
+SUCCESS = (200, 201, 204)
+
+
+def toggle(url):
+    """Сценарий, по очереди добавляющий и удаляющий запись по url."""
+    state = {'added': False}
+
+    def request(client):
+        method = client.delete if state['added'] else client.post
+        state['added'] = not state['added']
+        return method(url)
+    return request
+
+
+def get(urls):
+    """Сценарий, по кругу запрашивающий адреса из urls."""
+    urls = cycle(urls)
+    return lambda client: client.get(next(urls))
+
+
+def scenarios(recipes, authors):
+    """Сценарии в виде {имя: (авторизован ли клиент, функция запроса)}."""
+    free_recipe = recipes[-1]
+    return {
+        'recipes_list': (True, get(
+            f'/api/recipes/?page={page}' for page in range(1, 6)
+        )),
+        'recipes_list_anonymous': (False, get(
+            f'/api/recipes/?page={page}' for page in range(1, 6)
+        )),
+        'recipes_list_cursor': (True, get(
+            ['/api/recipes/?pagination=cursor']
+        )),
+        'recipe_detail': (True, get(
+            f'/api/recipes/{recipe}/' for recipe in recipes[:50]
+        )),
+        'recipes_ordering': (True, get(
+            f'/api/recipes/?ordering={ordering}'
+            for ordering in ('trending', 'popular')
+        )),
+        'recipes_filter_tags': (True, get(
+            ['/api/recipes/?tags=tag-0&tags=tag-1']
+        )),
+        'recipes_filter_author': (True, get(
+            f'/api/recipes/?author={author}' for author in authors[:20]
+        )),
+        'recipes_filter_favorited': (True, get(
+            ['/api/recipes/?is_favorited=1']
+        )),
+        'recipes_filter_shopping_cart': (True, get(
+            ['/api/recipes/?is_in_shopping_cart=1']
+        )),
+        'recipes_search': (True, get(
+            f'/api/recipes/?search=рецепт {number}' for number in range(10)
+        )),
+        'recipes_by_ingredients': (True, get(
+            f'/api/recipes/by_ingredients/?ids={first},{first + 1},'
+            f'{first + 2}' for first in range(1, 30, 3)
+        )),
+        'ingredients_search': (True, get(
+            f'/api/ingredients/?name=ингредиент {number}'
+            for number in range(10)
+        )),
+        'feed': (True, get(['/api/recipes/feed/'])),
+        'subscriptions': (True, get(
+            ['/api/users/subscriptions/?recipes_limit=3']
+        )),
+        'favorite_toggle': (True, toggle(
+            f'/api/recipes/{free_recipe}/favorite/'
+        )),
+        'shopping_cart_toggle': (True, toggle(
+            f'/api/recipes/{free_recipe}/shopping_cart/'
+        )),
+        'download_shopping_cart': (True, get(
+            ['/api/recipes/download_shopping_cart/']
+        )),
+    }
+
+
+def measure(client, request, repeat, warmup):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    for _ in range(warmup):
+        response = request(client)
+        if response.streaming:
+            b''.join(response.streaming_content)
+    timings = []
+    queries = []
+    statuses = Counter()
+    started = perf_counter()
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as context:
+            request_started = perf_counter()
+            response = request(client)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            timings.append((perf_counter() - request_started) * 1000)
+        queries.append(len(context))
+        statuses[response.status_code] += 1
+    elapsed = perf_counter() - started
+    return summarize(timings, queries, statuses, elapsed)
+
+
+def summarize(timings, queries, statuses, elapsed):
+    percentiles = (
+        quantiles(timings, n=100, method='inclusive')
+        if len(timings) > 1 else timings * 99
+    )
+    return {
+        'requests': len(timings),
+        'errors': sum(
+            count for status, count in statuses.items()
+            if status not in SUCCESS
+        ),
+        'statuses': {str(status): count for status, count in statuses.items()},
+        'throughput_rps': round(len(timings) / elapsed, 2),
+        'mean_ms': round(sum(timings) / len(timings), 3),
+        'p50_ms': round(percentiles[49], 3),
+        'p95_ms': round(percentiles[94], 3),
+        'queries_median': median(queries),
+        'queries_max': max(queries),
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'),
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(options):
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+
+    from recipes.models import Recipe
+
+    caches = None if options['cache'] else {
+        'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+    }
+    with test_database() as connection, override_settings(
+        **({'CACHES': caches} if caches else {})
+    ):
+        users = seed(options)
+        recipes = list(Recipe.objects.order_by('id').values_list(
+            'id', flat=True
+        ))
+        authenticated = APIClient()
+        authenticated.force_authenticate(users[0])
+        clients = {True: authenticated, False: APIClient()}
+        results = {}
+        for name, (auth, request) in scenarios(
+            recipes, [other.id for other in users]
+        ).items():
+            if options['only'] and name not in options['only']:
+                continue
+            results[name] = measure(
+                clients[auth], request, options['repeat'], options['warmup']
+            )
+        return {
+            'commit': current_commit(),
+            'database': connection.vendor,
+            'options': options,
+            'results': results,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument(
+        '--cache',
+        action='store_true',
+        help='Не отключать кеш ответов (по умолчанию замеряется путь до БД).'
+    )
+    parser.add_argument(
+        '--only',
+        nargs='+',
+        help='Запустить только перечисленные сценарии.'
+    )
+    parser.add_argument('--output', help='Файл для JSON с результатами.')
+    options = vars(parser.parse_args())
+    setup()
+    report = json.dumps(run(options), ensure_ascii=False, indent=2)
+    if options['output']:
+        with open(options['output'], 'w', encoding='utf-8') as file:
+            file.write(report + '\n')
+    else:
+        sys.stdout.write(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+import os
+from contextlib import contextmanager
+
+import django
+
+
+def setup():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """
+    Создаёт отдельную тестовую БД (test_<DB_NAME>, для SQLite — в памяти)
+    по текущим моделям и удаляет её после замеров. Рабочая БД не трогается.
+    """
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import (setup_test_environment,
+                                   teardown_test_environment)
+
+    settings.MIGRATION_MODULES = {'users': None, 'recipes': None}
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(
+        verbosity=0,
+        autoclobber=True,
+        serialize=False
+    )
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
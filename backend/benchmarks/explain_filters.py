@@ -0,0 +1,116 @@
+"""
+Замеры фильтров RecipeFilterSet с индексами и без них.
+
+Запуск из каталога backend:
+    python -m benchmarks.explain_filters --recipes 20000 --repeat 20
+
+Данные создаются в отдельной тестовой БД; для каждой комбинации фильтров
+печатаются EXPLAIN и медианное время выборки первой страницы.
+"""
+import argparse
+from statistics import median
+from time import perf_counter
+
+from benchmarks.database import setup, test_database
+from benchmarks.seed import add_arguments, seed
+
+PAGE_SIZE = 6
+
+
+def filter_combinations(users):
+    author = users[0].id
+    return (
+        ('без фильтров', {}),
+        ('author', {'author': author}),
+        ('tags (1)', {'tags': ['tag-0']}),
+        ('tags (2)', {'tags': ['tag-0', 'tag-1']}),
+        ('author + tags', {'author': author, 'tags': ['tag-0']}),
+        ('is_favorited', {'is_favorited': 'true'}),
+        ('is_in_shopping_cart', {'is_in_shopping_cart': 'true'}),
+        ('tags + is_favorited', {'tags': ['tag-0'], 'is_favorited': 'true'}),
+    )
+
+
+def build_queryset(user, data):
+    from django.http import QueryDict
+    from django.test import RequestFactory
+
+    from recipes.filters import RecipeFilterSet
+    from recipes.models import Recipe
+
+    query = QueryDict(mutable=True)
+    for key, value in data.items():
+        if isinstance(value, list):
+            query.setlist(key, value)
+        else:
+            query[key] = value
+    request = RequestFactory().get('/')
+    request.user = user
+    filterset = RecipeFilterSet(
+        query,
+        queryset=Recipe.objects.all(),
+        request=request
+    )
+    return filterset.qs[:PAGE_SIZE]
+
+
+def measure(user, data, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = perf_counter()
+        list(build_queryset(user, data))
+        timings.append((perf_counter() - started) * 1000)
+    return build_queryset(user, data).explain(), median(timings)
+
+
+def benchmark_indexes(connection):
+    from recipes.models import (Favorites, Ingredient, Recipe,
+                                RecipeTagRelations, ShoppingCart)
+
+    return [
+        (model, index)
+        for model in (Recipe, Favorites, ShoppingCart, RecipeTagRelations,
+                      Ingredient)
+        for index in model._meta.indexes
+    ]
+
+
+def run(options):
+    with test_database() as connection:
+        users = seed(options)
+        user = users[0]
+        indexes = benchmark_indexes(connection)
+        results = {}
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.remove_index(model, index)
+        for label, data in filter_combinations(users):
+            results[label] = [measure(user, data, options['repeat'])]
+        with connection.schema_editor() as editor:
+            for model, index in indexes:
+                editor.add_index(model, index)
+        for label, data in filter_combinations(users):
+            results[label].append(measure(user, data, options['repeat']))
+        for label, ((plan_before, before), (plan_after, after)) in (
+            results.items()
+        ):
+            print(f'=== {label}: без индексов {before:.2f} мс, '
+                  f'с индексами {after:.2f} мс')
+            print('--- EXPLAIN без индексов:')
+            print(plan_before)
+            print('--- EXPLAIN с индексами:')
+            print(plan_after)
+            print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    add_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=10)
+    options = vars(parser.parse_args())
+    setup()
+    run(options)
+
+
+if __name__ == '__main__':
+    main()
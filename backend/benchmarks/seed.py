@@ -0,0 +1,114 @@
+import random
+from io import StringIO
+
+DEFAULTS = {
+    'users': 50,
+    'recipes': 1000,
+    'tags': 5,
+    'ingredients': 300,
+    'ingredients_per_recipe': 8,
+    'tags_per_recipe': 2,
+    'favorites_per_user': 20,
+    'carts_per_user': 5,
+    'subscriptions_per_user': 5,
+}
+
+
+def add_arguments(parser):
+    """Добавляет в argparse параметры объёма тестовых данных."""
+    for name, default in DEFAULTS.items():
+        parser.add_argument(
+            '--' + name.replace('_', '-'),
+            type=int,
+            default=default
+        )
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--random-seed', type=int, default=0)
+
+
+def seed(options):
+    """
+    Заполняет БД пачками через bulk_create и пересчитывает денормализованные
+    счётчики, итоги корзин, поисковый индекс, ленты и рейтинг. Возвращает
+    список созданных пользователей.
+    """
+    from django.core.management import call_command
+
+    from recipes.counters import COUNTERS, recount
+    from recipes.feed import rebuild_timelines
+    from recipes.models import (Favorites, Ingredient, Recipe,
+                                RecipeIngredientRelations, RecipeTagRelations,
+                                ShoppingCart, Tag, User)
+    from recipes.search import rebuild_search_index
+    from users.models import Subscription
+
+    rnd = random.Random(options['random_seed'])
+
+    def sample(population, count):
+        return rnd.sample(population, min(count, len(population)))
+
+    batch_size = options['batch_size']
+    User.objects.bulk_create(
+        (User(username=f'user{number}', email=f'user{number}@foodgram.ru',
+              first_name='Имя', last_name='Фамилия', password='!')
+         for number in range(options['users'])),
+        batch_size=batch_size
+    )
+    users = list(User.objects.order_by('id'))
+    Tag.objects.bulk_create(
+        Tag(name=f'Тег {number}', color=f'#{number:06x}',
+            slug=f'tag-{number}')
+        for number in range(options['tags'])
+    )
+    tags = list(Tag.objects.values_list('id', flat=True))
+    Ingredient.objects.bulk_create(
+        (Ingredient(name=f'ингредиент {number}', measurement_unit='г')
+         for number in range(options['ingredients'])),
+        batch_size=batch_size
+    )
+    ingredients = list(Ingredient.objects.values_list('id', flat=True))
+    Recipe.objects.bulk_create(
+        (Recipe(author=rnd.choice(users), name=f'Рецепт {number}',
+                image='recipes/benchmark.png', text='Описание рецепта',
+                cooking_time=rnd.randint(1, 120))
+         for number in range(options['recipes'])),
+        batch_size=batch_size
+    )
+    recipes = list(Recipe.objects.values_list('id', flat=True))
+    RecipeTagRelations.objects.bulk_create(
+        (RecipeTagRelations(recipe_id=recipe, tag_id=tag)
+         for recipe in recipes
+         for tag in sample(tags, options['tags_per_recipe'])),
+        batch_size=batch_size
+    )
+    RecipeIngredientRelations.objects.bulk_create(
+        (RecipeIngredientRelations(recipe_id=recipe, ingredient_id=ingredient,
+                                   amount=rnd.randint(1, 500))
+         for recipe in recipes
+         for ingredient in sample(ingredients,
+                                  options['ingredients_per_recipe'])),
+        batch_size=batch_size
+    )
+    for model, per_user in ((Favorites, 'favorites_per_user'),
+                            (ShoppingCart, 'carts_per_user')):
+        model.objects.bulk_create(
+            (model(user=user, recipe_id=recipe)
+             for user in users
+             for recipe in sample(recipes, options[per_user])),
+            batch_size=batch_size
+        )
+    Subscription.objects.bulk_create(
+        (Subscription(user=user, author=author)
+         for user in users
+         for author in sample([other for other in users if other != user],
+                              options['subscriptions_per_user'])),
+        batch_size=batch_size
+    )
+    for model in COUNTERS:
+        recount(model, batch_size)
+    call_command('rebuild_shopping_cart_totals', batch_size=batch_size,
+                 stdout=StringIO())
+    rebuild_search_index(batch_size)
+    rebuild_timelines()
+    call_command('rank_recipes', batch_size=batch_size, stdout=StringIO())
+    return users
@@ -0,0 +1,219 @@
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+PLACEHOLDER_LISTS = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+
+
+class Histogram:
+    """Накопительная гистограмма в формате Prometheus."""
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.series = defaultdict(
+            lambda: {'counts': [0] * (len(buckets) + 1), 'sum': 0}
+        )
+
+    def observe(self, view, value):
+        series = self.series[view]
+        series['counts'][bisect_left(self.buckets, value)] += 1
+        series['sum'] += value
+
+    def render(self):
+        yield f'# HELP {self.name} {self.description}'
+        yield f'# TYPE {self.name} histogram'
+        for view, series in sorted(self.series.items()):
+            total = 0
+            for bound, count in zip(
+                (*self.buckets, '+Inf'), series['counts']
+            ):
+                total += count
+                labels = f'view="{view}",le="{bound}"'
+                yield f'{self.name}_bucket{{{labels}}} {total}'
+            yield f'{self.name}_sum{{view="{view}"}} {series["sum"]}'
+            yield f'{self.name}_count{{view="{view}"}} {total}'
+
+
+class MetricsRegistry:
+    """Метрики запросов, накопленные в памяти процесса."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {
+            'total': Histogram(
+                'foodgram_request_duration_seconds',
+                'Полное время обработки запроса.',
+                TIME_BUCKETS
+            ),
+            'db': Histogram(
+                'foodgram_request_db_duration_seconds',
+                'Время выполнения SQL-запросов.',
+                TIME_BUCKETS
+            ),
+            'serialization': Histogram(
+                'foodgram_request_serialization_duration_seconds',
+                'Время рендеринга ответа.',
+                TIME_BUCKETS
+            ),
+            'queries': Histogram(
+                'foodgram_request_queries',
+                'Количество SQL-запросов.',
+                QUERY_BUCKETS
+            ),
+        }
+        self.n_plus_one = Counter()
+
+    def record(self, view, timings, queries, repeated):
+        with self.lock:
+            for name, value in timings.items():
+                self.histograms[name].observe(view, value)
+            self.histograms['queries'].observe(view, queries)
+            if repeated:
+                self.n_plus_one[view] += 1
+
+    def render(self):
+        name = 'foodgram_request_n_plus_one_total'
+        with self.lock:
+            lines = []
+            for histogram in self.histograms.values():
+                lines.extend(histogram.render())
+            lines.append(
+                f'# HELP {name} Запросы с повторяющимся шаблоном SQL.'
+            )
+            lines.append(f'# TYPE {name} counter')
+            lines.extend(
+                f'{name}{{view="{view}"}} {count}'
+                for view, count in sorted(self.n_plus_one.items())
+            )
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class QueryRecorder:
+    """Обёртка execute: считает запросы, их время и шаблоны SQL."""
+    def __init__(self):
+        self.count = 0
+        self.duration = 0
+        self.templates = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.templates[PLACEHOLDER_LISTS.sub('(%s)', sql)] += 1
+
+    def repeated(self, threshold):
+        """Шаблоны SQL, выполненные за запрос больше threshold раз."""
+        return {
+            sql: count for sql, count in self.templates.items()
+            if count > threshold
+        }
+
+
+def get_view_name(request):
+    """Имя обработчика вида RecipeViewSet.list для подписи метрик."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view = match.func
+    actions = getattr(view, 'actions', None)
+    if actions and request.method.lower() in actions:
+        return f'{view.cls.__name__}.{actions[request.method.lower()]}'
+    if hasattr(view, 'cls'):
+        return view.cls.__name__
+    return match.view_name
+
+
+class RequestMetricsMiddleware:
+    """
+    Записывает число SQL-запросов, время БД, рендеринга и полное время
+    по каждому обработчику, отмечает N+1 и добавляет Server-Timing.
+    Включается настройкой REQUEST_METRICS.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        request.metrics_render = 0
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+            if response.streaming:
+                response.streaming_content = self.stream(
+                    response.streaming_content, stack.pop_all(),
+                    request, recorder, start
+                )
+                return response
+        timings = self.record(request, recorder, start)
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={timings["db"] * 1000:.1f};'
+            f'desc="{recorder.count} queries"',
+            f'serialization;dur={timings["serialization"] * 1000:.1f}',
+            f'total;dur={timings["total"] * 1000:.1f}',
+        ))
+        return response
+
+    def stream(self, content, stack, request, recorder, start):
+        """
+        Отдаёт тело потокового ответа, продолжая считать запросы;
+        метрики записываются, когда поток прочитан или закрыт.
+        Заголовок Server-Timing к этому моменту уже отправлен,
+        поэтому для потоковых ответов он не добавляется.
+        """
+        try:
+            yield from content
+        finally:
+            stack.close()
+            self.record(request, recorder, start)
+
+    def record(self, request, recorder, start):
+        total = time.perf_counter() - start
+        view = get_view_name(request)
+        repeated = recorder.repeated(
+            settings.REQUEST_METRICS_N_PLUS_ONE_THRESHOLD
+        )
+        for sql, count in repeated.items():
+            logger.warning('Возможный N+1 в %s: %s раз %s', view, count, sql)
+        timings = {
+            'total': total,
+            'db': recorder.duration,
+            'serialization': request.metrics_render,
+        }
+        registry.record(view, timings, recorder.count, repeated)
+        return timings
+
+    def process_template_response(self, request, response):
+        start = time.perf_counter()
+
+        def rendered(response):
+            request.metrics_render = time.perf_counter() - start
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def metrics_view(request):
+    """Метрики запросов в текстовом формате Prometheus."""
+    return HttpResponse(
+        registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
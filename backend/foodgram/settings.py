@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -37,6 +38,13 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+REQUEST_METRICS = os.getenv('REQUEST_METRICS', default='False') == 'True'
+REQUEST_METRICS_N_PLUS_ONE_THRESHOLD = int(
+    os.getenv('REQUEST_METRICS_N_PLUS_ONE_THRESHOLD', default=10)
+)
+if REQUEST_METRICS:
+    MIDDLEWARE.insert(0, 'foodgram.metrics.RequestMetricsMiddleware')
+
 ROOT_URLCONF = 'foodgram.urls'
 
 TEMPLATES = [
@@ -68,6 +76,33 @@ DATABASES = {
     }
 }
 
+# Номера поколений хранятся в базе (recipes.Generation), а в кеше лежат
+# ответы, состояние пользователей и журнал изменений индекса
+# ингредиентов. Кеш должен быть общим для всех воркеров gunicorn,
+# поэтому по умолчанию используется файловый кеш, а не локальный кеш
+# процесса. При нескольких серверах нужен Redis или Memcached
+# (CACHE_BACKEND и CACHE_LOCATION).
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            default=os.path.join(tempfile.gettempdir(), 'foodgram-cache')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', default=10000)),
+        },
+    }
+}
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=300))
+VIEWER_STATE_CACHE_TIMEOUT = int(
+    os.getenv('VIEWER_STATE_CACHE_TIMEOUT', default=300)
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -102,6 +137,14 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 AUTH_USER_MODEL = 'users.User'
 
+RECIPE_IMAGE_MAX_BYTES = int(
+    os.getenv('RECIPE_IMAGE_MAX_BYTES', default=5 * 1024 * 1024)
+)
+RECIPE_IMAGE_MAX_DIMENSION = int(
+    os.getenv('RECIPE_IMAGE_MAX_DIMENSION', default=6000)
+)
+RECIPE_IMAGE_WORKERS = int(os.getenv('RECIPE_IMAGE_WORKERS', default=2))
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -114,6 +157,23 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'recipes.pagination.CustomPagination',
 }
 
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', default=50))
+INGREDIENT_CATALOG_IN_MEMORY = (
+    os.getenv('INGREDIENT_CATALOG_IN_MEMORY', default='True') == 'True'
+)
+INGREDIENT_INDEX_CHANGES_TIMEOUT = int(
+    os.getenv('INGREDIENT_INDEX_CHANGES_TIMEOUT', default=3600)
+)
+SIMILAR_RECIPES_LIMIT = int(os.getenv('SIMILAR_RECIPES_LIMIT', default=10))
+FEED_FANOUT_THRESHOLD = int(
+    os.getenv('FEED_FANOUT_THRESHOLD', default=10000)
+)
+FEED_FANOUT_BATCH_SIZE = int(os.getenv('FEED_FANOUT_BATCH_SIZE', default=1000))
+FEED_BACKFILL_LIMIT = int(os.getenv('FEED_BACKFILL_LIMIT', default=100))
+RANKING_HALF_LIFE_HOURS = float(
+    os.getenv('RANKING_HALF_LIFE_HOURS', default=24)
+)
+
 DJOSER = {
     'HIDE_USERS': False,
     'LOGIN_FIELD': 'email',
@@ -4,6 +4,7 @@ from django.contrib import admin
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
+from foodgram.metrics import metrics_view
 from recipes.views import IngredientViewSet, RecipeViewSet, TagViewSet
 
 router = DefaultRouter()
@@ -17,6 +18,9 @@ urlpatterns = [
     path('api/', include('users.urls')),
 ]
 
+if settings.REQUEST_METRICS:
+    urlpatterns.insert(0, path('api/_metrics', metrics_view))
+
 if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
@@ -2,11 +2,13 @@ from django.contrib import admin
 from django.contrib.admin import ModelAdmin
 
 from recipes.models import (Favorites,
+                            ImageBlob,
                             Ingredient,
                             Recipe,
                             RecipeIngredientRelations,
                             RecipeTagRelations,
                             ShoppingCart,
+                            ShoppingCartTotal,
                             Tag)
 
 
@@ -21,12 +23,9 @@ class IngredientAdmin(ModelAdmin):
 
 
 class RecipeAdmin(ModelAdmin):
-    list_display = ('name', 'author', 'count_favorites')
+    list_display = ('name', 'author', 'favorites_count', 'in_carts_count')
     list_filter = ('author', 'name', 'tags')
 
-    def count_favorites(self, obj):
-        return obj.favorites.count()
-
 
 class RecipeTagRelationsAdmin(ModelAdmin):
     list_display = ('tag', 'recipe')
@@ -34,9 +33,22 @@ class RecipeTagRelationsAdmin(ModelAdmin):
 
 
 class RecipeIngredientRelationsAdmin(ModelAdmin):
+    """
+    Только просмотр: количества меняются через API рецептов, которое
+    переносит изменения в итоги корзин.
+    """
     list_display = ('ingredient', 'recipe', 'amount')
     list_filter = ('ingredient', 'recipe')
 
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 class FavoritesAdmin(ModelAdmin):
     list_display = ('user', 'recipe')
@@ -48,6 +60,16 @@ class ShoppingCartAdmin(ModelAdmin):
     list_filter = ('user', 'recipe')
 
 
+class ShoppingCartTotalAdmin(ModelAdmin):
+    list_display = ('user', 'ingredient', 'amount')
+    list_filter = ('user',)
+
+
+class ImageBlobAdmin(ModelAdmin):
+    list_display = ('name', 'references', 'updated_at')
+    search_fields = ('name',)
+
+
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Recipe, RecipeAdmin)
@@ -55,3 +77,5 @@ admin.site.register(RecipeTagRelations, RecipeTagRelationsAdmin)
 admin.site.register(RecipeIngredientRelations, RecipeIngredientRelationsAdmin)
 admin.site.register(Favorites, FavoritesAdmin)
 admin.site.register(ShoppingCart, ShoppingCartAdmin)
+admin.site.register(ShoppingCartTotal, ShoppingCartTotalAdmin)
+admin.site.register(ImageBlob, ImageBlobAdmin)
@@ -0,0 +1,118 @@
+import time
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from recipes.models import Generation
+
+RESPONSE_KEY = 'recipes:response:{}:{}'
+CHANGE_KEY = 'recipes:change:{}:{}'
+MAX_CHANGES = 1000
+
+
+def get_generations(names):
+    """
+    Возвращает текущие номера поколений для перечисленных имён одним
+    запросом. Поколение, которое ещё ни разу не увеличивалось, равно 0.
+    """
+    values = dict(Generation.objects.filter(
+        name__in=names
+    ).values_list('name', 'value'))
+    return [values.get(name, 0) for name in names]
+
+
+def get_generation(name):
+    return get_generations((name,))[0]
+
+
+@transaction.atomic
+def increment_generation(name):
+    """
+    Атомарно увеличивает поколение и возвращает новое значение. Новая
+    строка начинается с time_ns(), поэтому номера не повторяются даже
+    после удаления строки.
+    """
+    updated = Generation.objects.filter(name=name).update(
+        value=F('value') + 1
+    )
+    if not updated:
+        value = time.time_ns()
+        try:
+            with transaction.atomic():
+                Generation.objects.create(name=name, value=value)
+            return value
+        except IntegrityError:
+            Generation.objects.filter(name=name).update(
+                value=F('value') + 1
+            )
+    return Generation.objects.values_list('value', flat=True).get(name=name)
+
+
+def bump_generation(name):
+    """
+    Увеличивает поколение после фиксации транзакции, чтобы
+    параллельный запрос не закешировал данные до коммита.
+    """
+    transaction.on_commit(lambda: increment_generation(name))
+
+
+def publish_change(name, value, timeout):
+    """
+    После фиксации транзакции увеличивает поколение name и записывает
+    value в журнал изменений под новым номером поколения. Номер выдаётся
+    атомарно; если запись с таким номером всё же уже есть, она удаляется,
+    и читатели журнала перестраивают данные целиком.
+    """
+    def publish():
+        key = CHANGE_KEY.format(name, increment_generation(name))
+        if not cache.add(key, value, timeout=timeout):
+            cache.delete(key)
+    transaction.on_commit(publish)
+
+
+def get_changes(name, start, end):
+    """
+    Значения из журнала изменений для поколений start+1..end или None,
+    если часть записей уже вытеснена из кеша или их больше MAX_CHANGES.
+    """
+    if end - start > MAX_CHANGES:
+        return None
+    keys = [CHANGE_KEY.format(name, version)
+            for version in range(start + 1, end + 1)]
+    values = cache.get_many(keys)
+    if len(values) != len(keys):
+        return None
+    return [values[key] for key in keys]
+
+
+def response_cache_key(request, names):
+    url = md5(request.build_absolute_uri().encode()).hexdigest()
+    generations = '.'.join(str(value) for value in get_generations(names))
+    return RESPONSE_KEY.format(url, generations)
+
+
+def response_etag(request, names):
+    """
+    Слабый ETag ответа из URL, формата, пользователя и поколений names
+    (модели и состояние пользователя); вычисляется одним запросом
+    к таблице поколений без выборки самих данных.
+    """
+    parts = (
+        request.build_absolute_uri(),
+        request.META.get('HTTP_ACCEPT', ''),
+        request.user.id or 0,
+        *get_generations(names),
+    )
+    digest = md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return f'W/"{digest}"'
+
+
+def get_cached_response(key):
+    return cache.get(key)
+
+
+def set_cached_response(key, data):
+    cache.set(key, data, timeout=settings.RESPONSE_CACHE_TIMEOUT)
@@ -0,0 +1,125 @@
+from array import array
+from bisect import bisect_left
+
+from recipes.cache import get_generation
+from recipes.models import Ingredient, Tag
+
+
+class CatalogSnapshot:
+    """
+    Снимок справочника ингредиентов: компактные массивы, отсортированные
+    по названию в нижнем регистре, и словарь позиций по id.
+    """
+    def __init__(self, rows, version):
+        rows = sorted(
+            (name.lower(), pk, name, unit) for pk, name, unit in rows
+        )
+        self.version = version
+        self.keys = [row[0] for row in rows]
+        self.ids = array('q', (row[1] for row in rows))
+        self.names = [row[2] for row in rows]
+        self.units = [row[3] for row in rows]
+        self.positions = {
+            pk: position for position, pk in enumerate(self.ids)
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def build(self, position):
+        return Ingredient(
+            id=self.ids[position],
+            name=self.names[position],
+            measurement_unit=self.units[position]
+        )
+
+    def all(self):
+        return [self.build(position) for position in range(len(self))]
+
+    def get(self, pk):
+        try:
+            position = self.positions.get(int(pk))
+        except (TypeError, ValueError):
+            return None
+        if position is None:
+            return None
+        return self.build(position)
+
+    def in_bulk(self, pks):
+        result = {}
+        for pk in pks:
+            ingredient = self.get(pk)
+            if ingredient is not None:
+                result[ingredient.id] = ingredient
+        return result
+
+    def search(self, name, limit):
+        """Сначала совпадения по началу названия, затем по вхождению."""
+        positions = []
+        position = bisect_left(self.keys, name)
+        while (position < len(self.keys) and len(positions) < limit
+               and self.keys[position].startswith(name)):
+            positions.append(position)
+            position += 1
+        for position, key in enumerate(self.keys):
+            if len(positions) >= limit:
+                break
+            if name in key and not key.startswith(name):
+                positions.append(position)
+        return [self.build(position) for position in positions]
+
+
+class IngredientCatalog:
+    """
+    Справочник ингредиентов в памяти процесса. Загружается один раз
+    на воркер и перечитывается, когда меняется поколение ингредиентов
+    в общем кеше.
+    """
+    def __init__(self):
+        self.snapshot = None
+
+    def get_snapshot(self):
+        version = get_generation('ingredient')
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.version != version:
+            snapshot = CatalogSnapshot(
+                Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                ),
+                version
+            )
+            self.snapshot = snapshot
+        return snapshot
+
+    def all(self):
+        return self.get_snapshot().all()
+
+    def get(self, pk):
+        return self.get_snapshot().get(pk)
+
+    def in_bulk(self, pks):
+        return self.get_snapshot().in_bulk(pks)
+
+    def search(self, name, limit):
+        return self.get_snapshot().search(name.strip().lower(), limit)
+
+
+class TagCatalog:
+    """
+    Соответствие slug -> id тегов в памяти процесса. Перечитывается,
+    когда меняется поколение тегов в общем кеше.
+    """
+    def __init__(self):
+        self.snapshot = (None, {})
+
+    def get_ids(self, slugs):
+        version = get_generation('tag')
+        snapshot_version, ids = self.snapshot
+        if snapshot_version != version:
+            ids = dict(Tag.objects.values_list('slug', 'id'))
+            self.snapshot = (version, ids)
+        return {ids[slug] for slug in slugs if slug in ids}
+
+
+ingredient_catalog = IngredientCatalog()
+tag_catalog = TagCatalog()
@@ -0,0 +1,65 @@
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Favorites, Recipe, ShoppingCart, User
+from users.models import Subscription
+
+COUNTERS = {
+    Recipe: {
+        'favorites_count': (Favorites, 'recipe'),
+        'in_carts_count': (ShoppingCart, 'recipe'),
+    },
+    User: {
+        'recipes_count': (Recipe, 'author'),
+        'followers_count': (Subscription, 'author'),
+    },
+}
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарно изменяет счётчик одним UPDATE без чтения строки."""
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def counted(model):
+    """Аннотирует строки модели фактическими значениями счётчиков."""
+    annotations = {}
+    for field, (source, relation) in COUNTERS[model].items():
+        annotations[f'actual_{field}'] = Coalesce(Subquery(
+            source.objects.filter(
+                **{relation: OuterRef('pk')}
+            ).order_by().values(relation).annotate(
+                total=Count('pk')
+            ).values('total')
+        ), 0)
+    return model.objects.annotate(**annotations)
+
+
+def recount(model, batch_size):
+    """Исправляет расхождения счётчиков пачками по первичному ключу."""
+    fields = tuple(COUNTERS[model])
+    repaired = 0
+    last_pk = 0
+    while True:
+        batch = list(
+            counted(model).filter(pk__gt=last_pk).order_by('pk')[:batch_size]
+        )
+        if not batch:
+            return repaired
+        last_pk = batch[-1].pk
+        changed = []
+        for obj in batch:
+            drift = False
+            for field in fields:
+                actual = getattr(obj, f'actual_{field}')
+                if getattr(obj, field) != actual:
+                    setattr(obj, field, actual)
+                    drift = True
+            if drift:
+                changed.append(obj)
+        if changed:
+            model.objects.bulk_update(changed, fields)
+            repaired += len(changed)
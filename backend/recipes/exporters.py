@@ -0,0 +1,144 @@
+import csv
+import json
+from hashlib import md5
+
+from django.http import StreamingHttpResponse
+from rest_framework.negotiation import BaseContentNegotiation
+
+from recipes.cache import get_generation
+
+STREAM_CHUNK_SIZE = 500
+
+
+class ExportContentNegotiation(BaseContentNegotiation):
+    """
+    Отключает выбор рендерера по ?format=, чтобы параметр можно было
+    использовать для выбора формата выгрузки.
+    """
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return (renderers[0], renderers[0].media_type)
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу возвращает записанную строку."""
+    def write(self, value):
+        return value
+
+
+class ShoppingListExporter:
+    """Базовый класс потоковой выгрузки списка покупок."""
+    format = None
+    content_type = None
+
+    def __init__(self, ingredients):
+        self.ingredients = ingredients
+
+    def header(self):
+        return ''
+
+    def row(self, ingredient):
+        raise NotImplementedError
+
+    def footer(self):
+        return ''
+
+    def stream(self):
+        yield self.header()
+        for ingredient in self.ingredients.iterator(
+            chunk_size=STREAM_CHUNK_SIZE
+        ):
+            yield self.row(ingredient)
+        yield self.footer()
+
+    def response(self, etag=None):
+        response = StreamingHttpResponse(
+            self.stream(),
+            content_type=self.content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{self.format}"'
+        )
+        if etag:
+            response['ETag'] = etag
+        return response
+
+
+class TextExporter(ShoppingListExporter):
+    format = 'txt'
+    content_type = 'text/plain;charset=UTF-8'
+
+    def header(self):
+        return 'Ингредиенты для избранных рецептов:\n\n'
+
+    def row(self, ingredient):
+        return (f'~ {ingredient["ingredient__name"]} - '
+                f'{ingredient["amount"]} '
+                f'({ingredient["ingredient__measurement_unit"]})\n\n')
+
+    def footer(self):
+        return 'Foodgram 2023\nХороших покупок!'
+
+
+class CSVExporter(ShoppingListExporter):
+    format = 'csv'
+    content_type = 'text/csv;charset=UTF-8'
+
+    def __init__(self, ingredients):
+        super().__init__(ingredients)
+        self.writer = csv.writer(Echo())
+
+    def header(self):
+        return self.writer.writerow(('name', 'measurement_unit', 'amount'))
+
+    def row(self, ingredient):
+        return self.writer.writerow((
+            ingredient['ingredient__name'],
+            ingredient['ingredient__measurement_unit'],
+            ingredient['amount']
+        ))
+
+
+class JSONExporter(ShoppingListExporter):
+    format = 'json'
+    content_type = 'application/json'
+
+    def stream(self):
+        separator = '['
+        for ingredient in self.ingredients.iterator(
+            chunk_size=STREAM_CHUNK_SIZE
+        ):
+            yield separator + self.row(ingredient)
+            separator = ','
+        yield '[]' if separator == '[' else ']'
+
+    def row(self, ingredient):
+        return json.dumps({
+            'name': ingredient['ingredient__name'],
+            'measurement_unit': ingredient['ingredient__measurement_unit'],
+            'amount': ingredient['amount']
+        }, ensure_ascii=False)
+
+
+EXPORTERS = {
+    exporter.format: exporter
+    for exporter in (TextExporter, CSVExporter, JSONExporter)
+}
+
+
+def shopping_list_etag(totals, format):
+    """
+    Слабый ETag по упорядоченным парам (ингредиент, количество) итогов
+    корзины и поколению ингредиентов (переименования, единицы измерения).
+    Читает только id и количества, без соединения со справочником.
+    """
+    digest = md5(f'{format}:{get_generation("ingredient")}'.encode())
+    for ingredient_id, amount in totals.order_by(
+        'ingredient_id'
+    ).values_list('ingredient_id', 'amount').iterator(
+        chunk_size=STREAM_CHUNK_SIZE
+    ):
+        digest.update(f':{ingredient_id}={amount}'.encode())
+    return f'W/"{digest.hexdigest()}"'
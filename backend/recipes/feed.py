@@ -0,0 +1,151 @@
+import heapq
+
+from django.conf import settings
+from django.db import transaction
+
+from recipes.models import Recipe, TimelineEntry
+from users.models import Subscription
+
+
+def is_celebrity(author):
+    """Рецепты автора читаются из ленты без рассылки подписчикам."""
+    return author.followers_count >= settings.FEED_FANOUT_THRESHOLD
+
+
+def fan_out(recipe):
+    """
+    После фиксации транзакции добавляет рецепт в ленты подписчиков
+    автора пачками по FEED_FANOUT_BATCH_SIZE.
+    """
+    if is_celebrity(recipe.author):
+        return
+
+    def deliver():
+        batch_size = settings.FEED_FANOUT_BATCH_SIZE
+        followers = Subscription.objects.filter(
+            author_id=recipe.author_id
+        ).order_by('user_id').values_list('user_id', flat=True)
+        last_id = 0
+        while True:
+            batch = list(followers.filter(user_id__gt=last_id)[:batch_size])
+            if not batch:
+                return
+            TimelineEntry.objects.bulk_create(
+                (TimelineEntry(user_id=user_id, recipe_id=recipe.id,
+                               author_id=recipe.author_id)
+                 for user_id in batch),
+                ignore_conflicts=True
+            )
+            last_id = batch[-1]
+    transaction.on_commit(deliver)
+
+
+def backfill(user_id, author):
+    """Добавляет в ленту последние FEED_BACKFILL_LIMIT рецептов автора."""
+    if is_celebrity(author):
+        return
+    recipe_ids = Recipe.objects.filter(
+        author=author
+    ).order_by('-id').values_list('id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, recipe_id=recipe_id,
+                       author_id=author.id)
+         for recipe_id in recipe_ids[:settings.FEED_BACKFILL_LIMIT]),
+        ignore_conflicts=True
+    )
+
+
+def prune(user_id, author_id):
+    """Удаляет из ленты рецепты автора после отписки."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+class FeedQuery:
+    """
+    Рецепты ленты в порядке -id для keyset-пагинации: записи таймлайна
+    читаются по индексу (user, -recipe) с условием recipe_id < курсор,
+    рецепты популярных авторов — по индексу (author, -id) с тем же
+    ограничением, затем потоки сливаются и рецепты загружаются по id.
+    Реализует order_by, filter и срез, которые использует
+    CursorPagination, поэтому передаётся в пагинатор вместо QuerySet.
+    """
+    def __init__(self, user, queryset, descending=True, bound=None):
+        self.user = user
+        self.queryset = queryset
+        self.descending = descending
+        self.bound = bound
+
+    def order_by(self, *ordering):
+        return FeedQuery(
+            self.user, self.queryset, ordering[0].startswith('-'), self.bound
+        )
+
+    def filter(self, id__lt=None, id__gt=None):
+        return FeedQuery(
+            self.user, self.queryset, self.descending,
+            (id__lt, id__gt)
+        )
+
+    def keyset(self, rows, field):
+        if self.bound is not None:
+            below, above = self.bound
+            if below is not None:
+                rows = rows.filter(**{f'{field}__lt': below})
+            if above is not None:
+                rows = rows.filter(**{f'{field}__gt': above})
+        return rows.order_by(f'-{field}' if self.descending else field)
+
+    def candidates(self, limit):
+        """Первые limit id из таймлайна и рецептов популярных авторов."""
+        streams = [list(self.keyset(
+            TimelineEntry.objects.filter(user=self.user), 'recipe_id'
+        ).values_list('recipe_id', flat=True)[:limit])]
+        for author_id in Subscription.objects.filter(
+            user=self.user,
+            author__followers_count__gte=settings.FEED_FANOUT_THRESHOLD
+        ).values_list('author_id', flat=True):
+            streams.append(list(self.keyset(
+                Recipe.objects.filter(author_id=author_id), 'id'
+            ).values_list('id', flat=True)[:limit]))
+        merged = []
+        for recipe_id in heapq.merge(*streams, reverse=self.descending):
+            if not merged or merged[-1] != recipe_id:
+                merged.append(recipe_id)
+        return merged[:limit]
+
+    def __getitem__(self, page):
+        """
+        Срез ленты. Кандидаты проверяются по отфильтрованному queryset;
+        если фильтры отсеяли часть из них, окно кандидатов удваивается.
+        """
+        limit = page.stop
+        while True:
+            candidates = self.candidates(limit)
+            matched = set(self.queryset.filter(
+                pk__in=candidates
+            ).values_list('pk', flat=True))
+            ids = [pk for pk in candidates if pk in matched]
+            if len(ids) >= page.stop or len(candidates) < limit:
+                break
+            limit *= 2
+        ids = ids[page.start:page.stop]
+        recipes = {
+            recipe.pk: recipe
+            for recipe in self.queryset.filter(pk__in=ids)
+        }
+        return [recipes[pk] for pk in ids]
+
+
+def feed_queryset(user, queryset):
+    """Лента пользователя из рецептов queryset в порядке -id."""
+    return FeedQuery(user, queryset)
+
+
+def rebuild_timelines():
+    """Заполняет ленты по всем существующим подпискам."""
+    subscriptions = Subscription.objects.select_related('author')
+    total = 0
+    for subscription in subscriptions.iterator(chunk_size=1000):
+        backfill(subscription.user_id, subscription.author)
+        total += 1
+    return total
@@ -1,20 +1,82 @@
+from django import forms
 from django.contrib.auth import get_user_model
+from django.db.models import Count, F
 from django_filters.rest_framework import FilterSet
-from django_filters.rest_framework.filters import (AllValuesMultipleFilter,
-                                                   BooleanFilter,
+from django_filters.rest_framework.filters import (BooleanFilter,
+                                                   CharFilter,
+                                                   ChoiceFilter,
+                                                   Filter,
                                                    ModelChoiceFilter)
 
-from recipes.models import Recipe
+from recipes.catalog import tag_catalog
+from recipes.models import Recipe, RecipeTagRelations
+from recipes.search import RecipeSearch
 
 User = get_user_model()
 
+TAGS_MODE_ANY = 'any'
+TAGS_MODE_ALL = 'all'
+
+
+class MultipleValueField(forms.Field):
+    """Поле для повторяющегося параметра запроса (?tags=a&tags=b)."""
+    widget = forms.SelectMultiple
+
+    def to_python(self, value):
+        if not value:
+            return []
+        return [str(item) for item in value]
+
+
+class TagsFilter(Filter):
+    """
+    Фильтр по slug тегов без выборки вариантов из БД: slug переводятся
+    в id по кешированному справочнику тегов.
+    """
+    field_class = MultipleValueField
+
 
 class RecipeFilterSet(FilterSet):
     """Фильтрация для модели Recipe."""
     author = ModelChoiceFilter(queryset=User.objects.all())
-    tags = AllValuesMultipleFilter(field_name='tags__slug')
+    tags = TagsFilter(method='tags_filter')
+    tags_mode = ChoiceFilter(
+        choices=((TAGS_MODE_ANY, 'Любой из тегов'),
+                 (TAGS_MODE_ALL, 'Все теги')),
+        method='tags_mode_filter'
+    )
     is_favorited = BooleanFilter(method='is_favorited_filter')
     is_in_shopping_cart = BooleanFilter(method='is_in_shopping_cart_filter')
+    search = CharFilter(method='search_filter')
+    ordering = ChoiceFilter(
+        choices=(('trending', 'Набирающие популярность'),
+                 ('popular', 'Популярные')),
+        method='ordering_filter'
+    )
+
+    def tags_filter(self, queryset, name, value):
+        if not value:
+            return queryset
+        slugs = set(value)
+        tag_ids = tag_catalog.get_ids(slugs)
+        if self.form.cleaned_data.get('tags_mode') == TAGS_MODE_ALL:
+            if len(tag_ids) != len(slugs):
+                return queryset.none()
+            return queryset.filter(
+                pk__in=RecipeTagRelations.objects.filter(
+                    tag_id__in=tag_ids
+                ).values('recipe').annotate(
+                    matched=Count('tag')
+                ).filter(matched=len(tag_ids)).values('recipe')
+            )
+        return queryset.filter(
+            pk__in=RecipeTagRelations.objects.filter(
+                tag_id__in=tag_ids
+            ).values('recipe_id')
+        )
+
+    def tags_mode_filter(self, queryset, name, value):
+        return queryset
 
     def is_favorited_filter(self, queryset, name, value):
         if value and not self.request.user.is_anonymous:
@@ -26,6 +88,20 @@ class RecipeFilterSet(FilterSet):
             return queryset.filter(shopping_cart__user=self.request.user)
         return queryset
 
+    def search_filter(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return RecipeSearch().search(queryset, value)
+
+    def ordering_filter(self, queryset, name, value):
+        if value in ('trending', 'popular'):
+            return queryset.order_by(
+                F(f'ranking__{value}').desc(nulls_last=True),
+                '-id'
+            )
+        return queryset
+
     class Meta:
         model = Recipe
         fields = ('author', 'tags')
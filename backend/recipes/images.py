@@ -0,0 +1,185 @@
+import base64
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from hashlib import sha256
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+from rest_framework.serializers import ValidationError
+
+from recipes.models import ImageBlob
+from recipes.storage import (recipe_image_storage,
+                             recipe_variant_storage)
+
+logger = logging.getLogger(__name__)
+
+DECODE_CHUNK_SIZE = 64 * 1024
+FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1280, 1280),
+}
+VARIANTS_DIR = 'recipes/variants'
+
+
+def decode_base64_image(encoded):
+    """
+    Декодирует base64 кусками с проверкой размера, проверяет картинку
+    по заголовку (без полного декодирования пикселей) и возвращает файл
+    с именем по SHA-256 содержимого.
+    """
+    max_bytes = settings.RECIPE_IMAGE_MAX_BYTES
+    if len(encoded) // 4 * 3 > max_bytes + 2:
+        raise ValidationError(
+            f'Размер картинки не должен превышать {max_bytes} байт.'
+        )
+    content = BytesIO()
+    digest = sha256()
+    try:
+        for start in range(0, len(encoded), DECODE_CHUNK_SIZE):
+            chunk = base64.b64decode(
+                encoded[start:start + DECODE_CHUNK_SIZE],
+                validate=True
+            )
+            digest.update(chunk)
+            content.write(chunk)
+    except ValueError:
+        raise ValidationError('Картинка должна быть закодирована в base64.')
+    if content.tell() > max_bytes:
+        raise ValidationError(
+            f'Размер картинки не должен превышать {max_bytes} байт.'
+        )
+    extension = validate_image(content)
+    return ContentFile(
+        content.getvalue(),
+        name=f'{digest.hexdigest()}.{extension}'
+    )
+
+
+def validate_image(content):
+    """Проверяет формат и размеры картинки и возвращает её расширение."""
+    max_dimension = settings.RECIPE_IMAGE_MAX_DIMENSION
+    too_large = ValidationError(
+        'Ширина и высота картинки не должны превышать '
+        f'{max_dimension} пикселей.'
+    )
+    content.seek(0)
+    try:
+        image = Image.open(content)
+    except Image.DecompressionBombError:
+        raise too_large
+    except (UnidentifiedImageError, OSError):
+        raise ValidationError('Загруженный файл не является картинкой.')
+    if image.format not in FORMATS:
+        raise ValidationError(
+            'Поддерживаются только форматы: ' + ', '.join(FORMATS) + '.'
+        )
+    if max(image.size) > max_dimension:
+        raise too_large
+    return FORMATS[image.format]
+
+
+def variant_names(name):
+    """Имена вариантов картинки: {вариант: {'webp': ..., 'original': ...}}."""
+    stem, extension = os.path.splitext(os.path.basename(name))
+    return {
+        variant: {
+            'webp': f'{VARIANTS_DIR}/{stem}_{variant}.webp',
+            'original': f'{VARIANTS_DIR}/{stem}_{variant}{extension}',
+        }
+        for variant in VARIANTS
+    }
+
+
+def generate_variants(name):
+    """Создаёт уменьшенные копии картинки и их WebP-версии."""
+    names = variant_names(name)
+    if recipe_variant_storage.exists(names['full']['webp']):
+        return
+    with recipe_image_storage.open(name) as file:
+        source = ImageOps.exif_transpose(Image.open(file))
+        source.load()
+    image_format = source.format or Image.registered_extensions().get(
+        os.path.splitext(name)[1].lower()
+    )
+    for variant, size in VARIANTS.items():
+        image = source.copy()
+        image.thumbnail(size)
+        for kind, variant_format in (('original', image_format),
+                                     ('webp', 'WEBP')):
+            if variant_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            buffer = BytesIO()
+            image.save(buffer, format=variant_format)
+            recipe_variant_storage.save(
+                names[variant][kind], ContentFile(buffer.getvalue())
+            )
+
+
+@lru_cache(maxsize=None)
+def get_executor():
+    return ThreadPoolExecutor(
+        max_workers=settings.RECIPE_IMAGE_WORKERS,
+        thread_name_prefix='recipe-images'
+    )
+
+
+def submit_variants(name):
+    """Отправляет генерацию в пул и пишет в лог её ошибку, если она была."""
+    def done(future):
+        error = future.exception()
+        if error is not None:
+            logger.error(
+                'Не удалось создать варианты картинки %s', name,
+                exc_info=(type(error), error, error.__traceback__)
+            )
+    get_executor().submit(generate_variants, name).add_done_callback(done)
+
+
+def schedule_variants(name):
+    """
+    Ставит генерацию вариантов в фоновый пул после фиксации транзакции.
+    При RECIPE_IMAGE_WORKERS = 0 варианты создаются синхронно.
+    """
+    if not name:
+        return
+    if settings.RECIPE_IMAGE_WORKERS:
+        transaction.on_commit(lambda: submit_variants(name))
+    else:
+        transaction.on_commit(lambda: generate_variants(name))
+
+
+def change_references(name, delta):
+    """Изменяет количество ссылок на файл картинки одним UPDATE."""
+    if not name or not delta:
+        return
+    queryset = ImageBlob.objects.filter(name=name)
+    if delta < 0:
+        queryset = queryset.filter(references__gte=-delta)
+    updated = queryset.update(
+        references=F('references') + delta,
+        updated_at=timezone.now()
+    )
+    if updated or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            ImageBlob.objects.create(name=name, references=delta)
+    except IntegrityError:
+        change_references(name, delta)
+
+
+def delete_image(name):
+    """Удаляет файл картинки вместе со всеми её вариантами."""
+    for urls in variant_names(name).values():
+        for variant in urls.values():
+            recipe_variant_storage.delete(variant)
+    recipe_image_storage.delete(name)
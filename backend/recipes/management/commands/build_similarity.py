@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from recipes.similarity import build_similarity
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит MinHash-подписи рецептов по ингредиентам и тегам и '
+        'сохраняет для каждого рецепта список похожих.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество строк в одном INSERT.'
+        )
+
+    def handle(self, *args, **options):
+        total = build_similarity(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {total}.'
+        ))
@@ -0,0 +1,106 @@
+import os
+from collections import Counter
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from recipes.images import delete_image
+from recipes.models import ImageBlob, Recipe
+from recipes.storage import recipe_image_storage
+
+IMAGES_DIR = 'recipes'
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет файлы картинок, на которые не ссылается ни один рецепт.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace',
+            type=int,
+            default=60,
+            help='Не трогать файлы, изменённые за последние N минут.'
+        )
+        parser.add_argument(
+            '--recount',
+            action='store_true',
+            help='Пересчитать ссылки по таблице рецептов перед очисткой.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать файлы, которые будут удалены.'
+        )
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            self.recount()
+        deadline = timezone.now() - timedelta(minutes=options['grace'])
+        names = set(ImageBlob.objects.filter(
+            references=0,
+            updated_at__lt=deadline
+        ).values_list('name', flat=True))
+        names.update(self.untracked(deadline))
+        for name in sorted(names):
+            self.stdout.write(name)
+            if not options['dry_run']:
+                self.collect(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов без ссылок: {len(names)}.'
+        ))
+
+    def recount(self):
+        references = Counter(
+            Recipe.objects.exclude(image='').values_list('image', flat=True)
+        )
+        with transaction.atomic():
+            blobs = ImageBlob.objects.select_for_update().in_bulk(
+                field_name='name'
+            )
+            for blob in blobs.values():
+                blob.references = references.get(blob.name, 0)
+            ImageBlob.objects.bulk_update(blobs.values(), ('references',))
+            ImageBlob.objects.bulk_create(
+                ImageBlob(name=name, references=count)
+                for name, count in references.items()
+                if name not in blobs
+            )
+
+    def untracked(self, deadline):
+        """
+        Файлы в каталоге картинок, для которых нет записи ImageBlob
+        и на которые не ссылается ни один рецепт (например, загруженные
+        до появления подсчёта ссылок).
+        """
+        if not recipe_image_storage.exists(IMAGES_DIR):
+            return set()
+        files = {
+            os.path.join(IMAGES_DIR, name)
+            for name in recipe_image_storage.listdir(IMAGES_DIR)[1]
+            if not name.endswith('.part')
+        }
+        known = set(ImageBlob.objects.filter(
+            name__in=files
+        ).values_list('name', flat=True))
+        known.update(Recipe.objects.filter(
+            image__in=files
+        ).values_list('image', flat=True))
+        return {
+            name for name in files - known
+            if recipe_image_storage.get_modified_time(name) < deadline
+        }
+
+    @transaction.atomic
+    def collect(self, name):
+        if Recipe.objects.filter(image=name).exists():
+            return
+        deleted, _ = ImageBlob.objects.filter(
+            name=name,
+            references=0
+        ).delete()
+        if deleted or not ImageBlob.objects.filter(name=name).exists():
+            delete_image(name)
@@ -0,0 +1,149 @@
+import csv
+import json
+import os
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.cache import bump_generation
+from recipes.models import Ingredient
+
+DEFAULT_PATH = os.path.join(
+    os.path.dirname(settings.BASE_DIR), 'data', 'ingredients.csv'
+)
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if len(row) >= 2:
+            yield row[0], row[1]
+
+
+def iter_json_array(file):
+    """Читает JSON-массив по частям, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('Ожидается JSON-массив ингредиентов.')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except ValueError:
+            chunk = file.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Некорректный JSON в файле ингредиентов.')
+            buffer += chunk
+            continue
+        buffer = buffer[end:]
+        yield item
+
+
+def read_json(file):
+    """
+    Поддерживает формат фикстур Django и простые объекты
+    с полями name и measurement_unit.
+    """
+    for item in iter_json_array(file):
+        fields = item.get('fields', item)
+        yield fields['name'], fields['measurement_unit']
+
+
+READERS = {'csv': read_csv, 'json': read_json}
+
+
+class Command(BaseCommand):
+    help = 'Загружает справочник ингредиентов из CSV или JSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            nargs='?',
+            default=DEFAULT_PATH,
+            help='Путь к файлу ingredients.csv или ingredients.json.'
+        )
+        parser.add_argument(
+            '--format',
+            choices=tuple(READERS),
+            help='Формат файла; по умолчанию определяется по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк в одном INSERT.'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только посчитать новые и пропущенные строки.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = (options['format']
+                       or os.path.splitext(path)[1].lstrip('.').lower())
+        if file_format not in READERS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        try:
+            file = open(path, encoding='utf-8')
+        except OSError as error:
+            raise CommandError(
+                f'Не удалось открыть файл ингредиентов {path}: '
+                f'{error.strerror}. Передайте путь к файлу аргументом, '
+                'например: manage.py load_ingredients /app/ingredients.json'
+            )
+        started = perf_counter()
+        with file, transaction.atomic():
+            inserted, skipped = self.load(
+                READERS[file_format](file),
+                options['batch_size'],
+                options['dry_run']
+            )
+            if options['dry_run']:
+                transaction.set_rollback(True)
+            elif inserted:
+                bump_generation('ingredient')
+        elapsed = perf_counter() - started
+        rate = (inserted + skipped) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Будет добавлено" if options["dry_run"] else "Добавлено"}: '
+            f'{inserted}, пропущено: {skipped}, '
+            f'{elapsed:.2f} с ({rate:.0f} строк/с).'
+        ))
+
+    def load(self, rows, batch_size, dry_run):
+        """
+        Отбрасывает повторы по (lower(name), measurement_unit) среди уже
+        загруженных и прочитанных строк и вставляет остальные пачками.
+        """
+        seen = {
+            (name.lower(), unit)
+            for name, unit in Ingredient.objects.values_list(
+                'name', 'measurement_unit'
+            ).iterator()
+        }
+        inserted = skipped = 0
+        batch = []
+        for name, unit in rows:
+            name, unit = name.strip(), unit.strip()
+            key = (name.lower(), unit)
+            if not name or key in seen:
+                skipped += 1
+                continue
+            seen.add(key)
+            inserted += 1
+            if not dry_run:
+                batch.append(Ingredient(name=name, measurement_unit=unit))
+            if len(batch) >= batch_size:
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+        return inserted, skipped
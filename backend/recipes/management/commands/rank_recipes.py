@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from recipes.ranking import rank_recipes
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает оценки trending и popular по добавлениям в избранное '
+        'и корзину с момента предыдущего запуска.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Пересчитать оценки по всем событиям с нуля.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество рецептов, обновляемых за один запрос.'
+        )
+
+    def handle(self, *args, **options):
+        run = rank_recipes(options['full'], options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано событий: {run.events}.'
+        ))
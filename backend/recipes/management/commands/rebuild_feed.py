@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from recipes.feed import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = 'Заполняет ленты подписчиков рецептами по существующим подпискам.'
+
+    def handle(self, *args, **options):
+        total = rebuild_timelines()
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано подписок: {total}.'
+        ))
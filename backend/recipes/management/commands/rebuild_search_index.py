@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from recipes.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Заполняет полнотекстовый индекс рецептов для существующих строк.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Количество рецептов, индексируемых за один запрос.'
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_search_index(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Проиндексировано рецептов: {total}.'
+        ))
@@ -0,0 +1,78 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recipes.models import ShoppingCartTotal
+from recipes.totals import live_totals
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает итоги корзин пользователей по живым данным.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сравнить сохранённые итоги с живыми данными.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки при записи итогов.'
+        )
+
+    def handle(self, *args, **options):
+        if options['verify']:
+            self.verify()
+        else:
+            self.rebuild(options['batch_size'])
+
+    def verify(self):
+        expected = {
+            (user, ingredient): total
+            for user, ingredient, total in live_totals().iterator()
+        }
+        stored = {
+            (user, ingredient): amount
+            for user, ingredient, amount in
+            ShoppingCartTotal.objects.values_list(
+                'user_id', 'ingredient_id', 'amount'
+            ).iterator()
+        }
+        mismatches = [
+            (key, stored.get(key), expected.get(key))
+            for key in expected.keys() | stored.keys()
+            if stored.get(key) != expected.get(key)
+        ]
+        for (user, ingredient), actual, total in sorted(
+            mismatches, key=lambda item: item[0]
+        ):
+            self.stdout.write(
+                f'user={user} ingredient={ingredient}: '
+                f'сохранено {actual}, ожидается {total}'
+            )
+        if mismatches:
+            self.stdout.write(self.style.ERROR(
+                f'Расхождений: {len(mismatches)}.'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('Итоги корзин совпадают.'))
+
+    @transaction.atomic
+    def rebuild(self, batch_size):
+        ShoppingCartTotal.objects.all().delete()
+        batch = []
+        created = 0
+        for user, ingredient, total in live_totals().iterator():
+            batch.append(ShoppingCartTotal(
+                user_id=user, ingredient_id=ingredient, amount=total
+            ))
+            if len(batch) >= batch_size:
+                ShoppingCartTotal.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        ShoppingCartTotal.objects.bulk_create(batch)
+        created += len(batch)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано итогов корзин: {created}.'
+        ))
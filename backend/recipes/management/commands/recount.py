@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from recipes.counters import COUNTERS, recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики избранного, корзин, рецептов и подписчиков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Количество строк, проверяемых за один запрос.'
+        )
+
+    def handle(self, *args, **options):
+        for model in COUNTERS:
+            repaired = recount(model, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: '
+                f'исправлено строк {repaired}.'
+            ))
@@ -0,0 +1,184 @@
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+
+from recipes.cache import get_changes, get_generation, publish_change
+from recipes.models import RecipeIngredientRelations
+
+GENERATION = 'recipe_ingredients'
+
+
+def bitset(recipe_ids):
+    """Множество id рецептов в виде целого числа с битом на каждый id."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return 0
+    bits = bytearray(max(recipe_ids) // 8 + 1)
+    for recipe_id in recipe_ids:
+        bits[recipe_id // 8] |= 1 << recipe_id % 8
+    return int.from_bytes(bits, 'little')
+
+
+class RankedMatches:
+    """
+    Рецепты, содержащие хотя бы один из доступных ингредиентов, в порядке
+    убывания покрытия, затем по числу недостающих ингредиентов и по -id.
+    Группы хранятся битовыми множествами, а срез извлекает только нужные
+    id, поэтому объект можно отдавать в пагинатор вместо QuerySet.
+    """
+    def __init__(self, union, groups):
+        self.union = union
+        merged = defaultdict(int)
+        for coverage, missing, bits in groups:
+            merged[coverage, missing] |= bits
+        self.groups = [
+            (coverage, missing, merged[coverage, missing])
+            for coverage, missing in sorted(merged)
+        ]
+
+    def __len__(self):
+        return bin(self.union).count('1')
+
+    def __getitem__(self, page):
+        matches = []
+        skip = page.start or 0
+        for coverage, missing, bits in self.groups:
+            size = bin(bits).count('1')
+            if skip >= size:
+                skip -= size
+                continue
+            while bits and len(matches) < page.stop - page.start:
+                recipe_id = bits.bit_length() - 1
+                bits ^= 1 << recipe_id
+                if skip:
+                    skip -= 1
+                    continue
+                matches.append({
+                    'recipe_id': recipe_id,
+                    'coverage': round(-coverage, 4),
+                    'missing': missing,
+                })
+            if len(matches) >= page.stop - page.start:
+                break
+        return matches
+
+
+class IngredientIndex:
+    """
+    Инвертированный индекс ингредиент -> битовое множество id рецептов
+    в памяти процесса, плюс множества рецептов по числу ингредиентов.
+    Строится один раз из RecipeIngredientRelations, затем дополняется
+    по журналу изменённых рецептов из общего кеша; если журнал неполон,
+    индекс перестраивается целиком.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.postings = {}
+        self.sizes = {}
+        self.recipes = {}
+
+    def mark_changed(self, recipe_id):
+        publish_change(
+            GENERATION,
+            recipe_id,
+            settings.INGREDIENT_INDEX_CHANGES_TIMEOUT
+        )
+
+    def refresh(self):
+        version = get_generation(GENERATION)
+        if self.version == version:
+            return
+        with self.lock:
+            if self.version == version:
+                return
+            changes = None
+            if self.version is not None and self.version < version:
+                changes = get_changes(GENERATION, self.version, version)
+            if changes is None:
+                self.build()
+            else:
+                self.update(set(changes))
+            self.version = version
+
+    def build(self):
+        relations = RecipeIngredientRelations.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        ).order_by()
+        recipes = defaultdict(set)
+        for recipe_id, ingredient_id in relations.iterator(chunk_size=10000):
+            recipes[recipe_id].add(ingredient_id)
+        postings = defaultdict(list)
+        sizes = defaultdict(list)
+        for recipe_id, ingredients in recipes.items():
+            sizes[len(ingredients)].append(recipe_id)
+            for ingredient_id in ingredients:
+                postings[ingredient_id].append(recipe_id)
+        self.postings = {
+            ingredient_id: bitset(recipe_ids)
+            for ingredient_id, recipe_ids in postings.items()
+        }
+        self.sizes = {
+            size: bitset(recipe_ids) for size, recipe_ids in sizes.items()
+        }
+        self.recipes = {
+            recipe_id: frozenset(ingredients)
+            for recipe_id, ingredients in recipes.items()
+        }
+
+    def update(self, recipe_ids):
+        relations = RecipeIngredientRelations.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values_list('recipe_id', 'ingredient_id')
+        current = defaultdict(set)
+        for recipe_id, ingredient_id in relations:
+            current[recipe_id].add(ingredient_id)
+        for recipe_id in recipe_ids:
+            bit = 1 << recipe_id
+            old = self.recipes.pop(recipe_id, frozenset())
+            new = frozenset(current.get(recipe_id, ()))
+            for ingredient_id in old - new:
+                self.postings[ingredient_id] &= ~bit
+            for ingredient_id in new - old:
+                self.postings[ingredient_id] = (
+                    self.postings.get(ingredient_id, 0) | bit
+                )
+            if old:
+                self.sizes[len(old)] &= ~bit
+            if new:
+                self.sizes[len(new)] = self.sizes.get(len(new), 0) | bit
+                self.recipes[recipe_id] = new
+
+    def match(self, ingredient_ids):
+        """
+        Считает для каждого рецепта число доступных ингредиентов
+        побитовым сумматором: planes[n] — n-й двоичный разряд счётчика.
+        """
+        self.refresh()
+        planes = []
+        union = 0
+        for ingredient_id in set(ingredient_ids):
+            carry = self.postings.get(ingredient_id, 0)
+            union |= carry
+            for number, plane in enumerate(planes):
+                planes[number], carry = plane ^ carry, plane & carry
+                if not carry:
+                    break
+            if carry:
+                planes.append(carry)
+        groups = []
+        for count in range(1, 2 ** len(planes)):
+            matched = union
+            for number, plane in enumerate(planes):
+                matched &= plane if count >> number & 1 else ~plane
+            if not matched:
+                continue
+            for size, recipes in self.sizes.items():
+                bits = matched & recipes
+                if size >= count and bits:
+                    groups.append((-count / size, size - count, bits))
+        return RankedMatches(union, groups)
+
+
+ingredient_index = IngredientIndex()
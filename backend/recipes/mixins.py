@@ -3,8 +3,114 @@ from rest_framework.mixins import (CreateModelMixin,
                                    ListModelMixin,
                                    RetrieveModelMixin,
                                    UpdateModelMixin)
+from django.utils.cache import patch_vary_headers
+from rest_framework.response import Response
+from rest_framework.status import HTTP_200_OK, HTTP_304_NOT_MODIFIED
 from rest_framework.viewsets import GenericViewSet
 
+from recipes.cache import (get_cached_response, response_cache_key,
+                           response_etag, set_cached_response)
+from recipes.pagination import CustomCursorPagination
+from recipes.viewer import ViewerState
+
+
+class ConditionalResponseMixin:
+    """
+    Добавляет ETag к ответам list/retrieve и отвечает 304 на совпадающий
+    If-None-Match до выборки и сериализации данных. Валидатор строится из
+    поколений моделей cache_models и версии состояния пользователя.
+    """
+    cache_models = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+    def conditional(self, handler, request, *args, **kwargs):
+        etag = response_etag(
+            request,
+            (*self.get_etag_models(),
+             *ViewerState.generation_names(request.user))
+        )
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            response = Response(status=HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (HTTP_200_OK, HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            patch_vary_headers(response, ('Authorization',))
+        return response
+
+    def get_etag_models(self):
+        return self.cache_models
+
+
+class CachedResponseMixin:
+    """
+    Кеширует ответы list/retrieve по URL и поколениям моделей
+    cache_models. В кеш попадает общее для всех представление, а данные
+    конкретного пользователя добавляются в personalize() после чтения.
+    """
+    cache_models = ()
+    private_query_params = ()
+    shared_representation = False
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(super().retrieve, request, *args, **kwargs)
+
+    def is_cacheable(self, request):
+        return request.user.is_anonymous or not any(
+            request.query_params.get(param) not in (None, '', '0', 'false')
+            for param in self.private_query_params
+        )
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['shared'] = self.shared_representation
+        return context
+
+    def cached(self, handler, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return handler(request, *args, **kwargs)
+        key = response_cache_key(request, self.cache_models)
+        data = get_cached_response(key)
+        if data is None:
+            self.shared_representation = True
+            response = handler(request, *args, **kwargs)
+            self.shared_representation = False
+            if response.status_code != 200:
+                return response
+            set_cached_response(key, response.data)
+            data = response.data
+        return Response(self.personalize(data))
+
+    def personalize(self, data):
+        return data
+
+
+class CursorPaginationMixin:
+    """
+    Переключает вьюсет на keyset-пагинацию, если клиент её запросил;
+    иначе используется обычная постраничная пагинация.
+    """
+    cursor_pagination_class = CustomCursorPagination
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.pagination_class is None:
+                self._paginator = None
+            elif self.cursor_pagination_class.is_requested(self.request):
+                self._paginator = self.cursor_pagination_class()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
 
 class CustomRecipeViewSet(CreateModelMixin,
                           DestroyModelMixin,
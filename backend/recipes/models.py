@@ -1,6 +1,10 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
+from django.db.models import Prefetch
+
+from recipes.storage import recipe_image_storage
 
 User = get_user_model()
 
@@ -45,6 +49,15 @@ class Ingredient(models.Model):
 
     class Meta:
         ordering = ('name',)
+        indexes = [
+            models.Index(fields=('name',), name='ingredient_name_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient'
+            )
+        ]
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
 
@@ -52,6 +65,45 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeQuerySet(models.QuerySet):
+    """QuerySet рецептов с подгрузкой связанных данных."""
+    def with_related(self):
+        return self.defer('search_vector').select_related(
+            'author'
+        ).prefetch_related(
+            'tags',
+            Prefetch(
+                'recipeingredientrelations_set',
+                queryset=RecipeIngredientRelations.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+
+    def limit_per_author(self, author_ids, limit):
+        """
+        Оставляет не больше limit последних рецептов каждого автора:
+        ROW_NUMBER() OVER (PARTITION BY author_id) считается в БД
+        сразу для всех авторов страницы.
+        """
+        author_ids = tuple(author_ids)
+        if not author_ids:
+            return self.none()
+        table = self.model._meta.db_table
+        placeholders = ', '.join(['%s'] * len(author_ids))
+        return self.filter(author_id__in=author_ids).extra(
+            where=(
+                f'{table}.id IN ('
+                f'SELECT id FROM ('
+                f'SELECT id, ROW_NUMBER() OVER ('
+                f'PARTITION BY author_id ORDER BY id DESC) AS row_number '
+                f'FROM {table} WHERE author_id IN ({placeholders})'
+                f') AS ranked WHERE row_number <= %s)',
+            ),
+            params=(*author_ids, limit)
+        )
+
+
 class Recipe(models.Model):
     """Модель рецептов."""
     author = models.ForeignKey(
@@ -65,7 +117,8 @@ class Recipe(models.Model):
         max_length=200)
     image = models.ImageField(
         'Картинка рецепта',
-        upload_to='recipes/')
+        upload_to='recipes/',
+        storage=recipe_image_storage)
     text = models.TextField('Описание рецепта')
     ingredients = models.ManyToManyField(
         Ingredient,
@@ -82,9 +135,34 @@ class Recipe(models.Model):
         'Время приготовления',
         validators=[MinValueValidator(1), ]
     )
+    created = models.DateTimeField('Дата создания', auto_now_add=True)
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
+    favorites_count = models.PositiveIntegerField(
+        'Количество добавлений в избранное',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        'Количество добавлений в корзину',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-id',)
+        indexes = [
+            models.Index(
+                fields=('author', '-id'),
+                name='recipe_author_id_idx'
+            ),
+        ]
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
 
@@ -108,6 +186,9 @@ class RecipeTagRelations(models.Model):
     class Meta:
         verbose_name = 'Связь тегов и рецептов'
         verbose_name_plural = 'Связь тегов и рецептов'
+        indexes = [
+            models.Index(fields=('recipe', 'tag'), name='recipe_tag_idx'),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=['tag', 'recipe'],
@@ -165,10 +246,21 @@ class Favorites(models.Model):
         related_name='favorites',
         verbose_name='Рецепт, добавленный в избранное'
     )
+    created_at = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True
+    )
 
     class Meta:
         verbose_name = 'Избранное'
         verbose_name_plural = 'Избранное'
+        indexes = [
+            models.Index(
+                fields=('recipe', 'user'),
+                name='favorites_recipe_user_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=('user', 'recipe'),
@@ -194,10 +286,21 @@ class ShoppingCart(models.Model):
         related_name='shopping_cart',
         verbose_name='Рецепты, добавленные в корзину'
     )
+    created_at = models.DateTimeField(
+        'Дата добавления',
+        auto_now_add=True,
+        db_index=True
+    )
 
     class Meta:
         verbose_name = 'Корзина'
         verbose_name_plural = 'Корзина'
+        indexes = [
+            models.Index(
+                fields=('recipe', 'user'),
+                name='shopping_cart_recipe_user_idx'
+            ),
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields=('user', 'recipe'),
@@ -207,3 +310,227 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f"({self.user} добавил рецепт {self.recipe} в корзину.)"
+
+
+class ShoppingCartTotal(models.Model):
+    """
+    Суммарное количество ингредиента в корзине пользователя.
+    Поддерживается при изменении корзины и рецептов в ней.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_totals',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_cart_totals',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    class Meta:
+        verbose_name = 'Итог корзины'
+        verbose_name_plural = 'Итоги корзины'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_cart_total'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.ingredient} в корзине {self.user}: {self.amount}"
+
+
+class ImageBlob(models.Model):
+    """
+    Файл картинки в хранилище с подсчётом ссылающихся на него рецептов.
+    Файлы без ссылок удаляет команда gc_media.
+    """
+    name = models.CharField('Имя файла', max_length=255, unique=True)
+    references = models.PositiveIntegerField('Количество ссылок', default=0)
+    updated_at = models.DateTimeField('Изменён', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Файл картинки'
+        verbose_name_plural = 'Файлы картинок'
+
+    def __str__(self):
+        return f"{self.name} ({self.references})"
+
+
+class SimilarRecipe(models.Model):
+    """
+    Ближайший по ингредиентам и тегам рецепт. Для каждого рецепта хранится
+    не больше SIMILAR_RECIPES_LIMIT строк, их заполняет build_similarity.
+    """
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField('Сходство')
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('recipe', 'similar'),
+                name='unique_similar_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('recipe', '-score'),
+                name='similar_recipe_score_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.similar} похож на {self.recipe} ({self.score:.2f})"
+
+
+class SimilarityBucket(models.Model):
+    """Корзина LSH: рецепты с совпадающей полосой MinHash-подписи."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similarity_buckets',
+        verbose_name='Рецепт'
+    )
+    band = models.PositiveSmallIntegerField('Полоса')
+    bucket = models.BigIntegerField('Хеш полосы')
+
+    class Meta:
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'Корзины LSH'
+        indexes = [
+            models.Index(
+                fields=('band', 'bucket'),
+                name='similarity_bucket_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe}: {self.band}/{self.bucket}"
+
+
+class TimelineEntry(models.Model):
+    """
+    Рецепт в ленте подписчика. Заполняется при публикации рецепта
+    (fan-out on write) для авторов с числом подписчиков ниже
+    FEED_FANOUT_THRESHOLD; рецепты более популярных авторов
+    подмешиваются в ленту при чтении.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор рецепта'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_timeline_entry'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-recipe'),
+                name='timeline_user_recipe_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='timeline_user_author_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe} в ленте {self.user}"
+
+
+class RecipeRanking(models.Model):
+    """
+    Предрасчитанные оценки рецепта для сортировки. trending хранится
+    относительно эпохи последнего запуска rank_recipes, поэтому порядок
+    совпадает с порядком по текущей затухающей оценке.
+    """
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ranking',
+        verbose_name='Рецепт'
+    )
+    trending = models.FloatField('Оценка с затуханием', default=0)
+    popular = models.FloatField('Оценка за всё время', default=0)
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = [
+            models.Index(fields=('-trending',), name='ranking_trending_idx'),
+            models.Index(fields=('-popular',), name='ranking_popular_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.recipe}: {self.trending:.2f} / {self.popular:.2f}"
+
+
+class RankingRun(models.Model):
+    """Запуск rank_recipes: до какого момента учтены события."""
+    processed_until = models.DateTimeField('События учтены до')
+    epoch = models.DateTimeField('Эпоха оценок trending')
+    events = models.PositiveIntegerField('Обработано событий', default=0)
+
+    class Meta:
+        verbose_name = 'Запуск расчёта рейтинга'
+        verbose_name_plural = 'Запуски расчёта рейтинга'
+        ordering = ('-processed_until',)
+
+    def __str__(self):
+        return f"Рейтинг до {self.processed_until}"
+
+
+class Generation(models.Model):
+    """
+    Номер поколения данных для ключей кеша ответов, ETag и журнала
+    изменений. Хранится в базе, а не в кеше: строка не вытесняется,
+    а увеличение выполняется атомарным UPDATE.
+    """
+    name = models.CharField('Имя', max_length=64, primary_key=True)
+    value = models.BigIntegerField('Номер поколения')
+
+    class Meta:
+        verbose_name = 'Поколение данных'
+        verbose_name_plural = 'Поколения данных'
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
@@ -1,6 +1,39 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 
 class CustomPagination(PageNumberPagination):
     page_size_query_param = 'limit'
     page_size = 6
+
+
+class CustomCursorPagination(CursorPagination):
+    """
+    Keyset-пагинация по -id: без COUNT(*) и OFFSET, с непрозрачным
+    курсором. Включается параметром ?pagination=cursor.
+    Параметры, задающие другой порядок (ранжированный поиск, сортировка
+    по оценкам), с курсором несовместимы и отклоняются с ошибкой 400,
+    чтобы порядок не подменялся на -id молча.
+    """
+    page_size_query_param = 'limit'
+    page_size = 6
+    ordering = '-id'
+    mode_query_param = 'pagination'
+    mode = 'cursor'
+    ordering_query_params = ('search', 'ordering')
+
+    @classmethod
+    def is_requested(cls, request):
+        return (request.query_params.get(cls.mode_query_param) == cls.mode
+                or cls.cursor_query_param in request.query_params)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        conflicting = {
+            param: 'Не поддерживается при пагинации курсором, '
+                   'которая упорядочивает результаты только по -id.'
+            for param in self.ordering_query_params
+            if request.query_params.get(param)
+        }
+        if conflicting:
+            raise ValidationError(conflicting)
+        return super().paginate_queryset(queryset, request, view)
@@ -0,0 +1,124 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from recipes.cache import bump_generation
+from recipes.models import (Favorites, Recipe, RankingRun, RecipeRanking,
+                            ShoppingCart)
+
+FAVORITE_WEIGHT = 1.0
+CART_WEIGHT = 0.5
+EVENT_WEIGHTS = (
+    (Favorites, FAVORITE_WEIGHT),
+    (ShoppingCart, CART_WEIGHT),
+)
+REBASE_AFTER_HALF_LIVES = 256
+
+
+def decay(moment, epoch):
+    """Вес события относительно эпохи: 2 ** (возраст эпохи / период)."""
+    half_life = settings.RANKING_HALF_LIFE_HOURS * 3600
+    return 2 ** ((moment - epoch).total_seconds() / half_life)
+
+
+def rebase(epoch, now):
+    """
+    Переносит эпоху на now, если оценки слишком выросли, и масштабирует
+    накопленные trending одним UPDATE.
+    """
+    half_life = timedelta(hours=settings.RANKING_HALF_LIFE_HOURS)
+    if now - epoch < half_life * REBASE_AFTER_HALF_LIVES:
+        return epoch
+    RecipeRanking.objects.update(trending=F('trending') / decay(now, epoch))
+    return now
+
+
+def collect_events(since, until, epoch):
+    """Суммирует веса событий избранного и корзин за период по рецептам."""
+    scores = defaultdict(float)
+    total = 0
+    for model, weight in EVENT_WEIGHTS:
+        events = model.objects.filter(created_at__lte=until)
+        if since is not None:
+            events = events.filter(created_at__gt=since)
+        for recipe_id, created_at in events.values_list(
+            'recipe_id', 'created_at'
+        ).order_by().iterator(chunk_size=10000):
+            scores[recipe_id] += weight * decay(created_at, epoch)
+            total += 1
+    return scores, total
+
+
+def store_scores(scores, batch_size):
+    """
+    Прибавляет trending и пересчитывает popular по денормализованным
+    счётчикам для затронутых рецептов.
+    """
+    recipe_ids = list(scores)
+    for start in range(0, len(recipe_ids), batch_size):
+        batch = recipe_ids[start:start + batch_size]
+        rankings = RecipeRanking.objects.in_bulk(batch)
+        counters = Recipe.objects.filter(pk__in=batch).values_list(
+            'pk', 'favorites_count', 'in_carts_count'
+        )
+        created = []
+        for recipe_id, favorites, carts in counters:
+            ranking = rankings.get(recipe_id)
+            if ranking is None:
+                ranking = RecipeRanking(recipe_id=recipe_id)
+                created.append(ranking)
+            ranking.trending += scores[recipe_id]
+            ranking.popular = (favorites * FAVORITE_WEIGHT
+                               + carts * CART_WEIGHT)
+        RecipeRanking.objects.bulk_update(
+            rankings.values(), ('trending', 'popular')
+        )
+        RecipeRanking.objects.bulk_create(created)
+
+
+def refresh_popular(batch_size):
+    """
+    Пересчитывает popular у рецептов, счётчики которых разошлись
+    с сохранённой оценкой: удаление из избранного или корзины
+    не оставляет событий, поэтому такие рецепты ищутся сравнением.
+    """
+    stale = RecipeRanking.objects.annotate(
+        current=(F('recipe__favorites_count') * FAVORITE_WEIGHT
+                 + F('recipe__in_carts_count') * CART_WEIGHT)
+    ).exclude(popular=F('current')).values_list('pk', 'current')
+    RecipeRanking.objects.bulk_update(
+        [RecipeRanking(pk=pk, popular=current)
+         for pk, current in stale.iterator(chunk_size=batch_size)],
+        ('popular',),
+        batch_size=batch_size
+    )
+
+
+@transaction.atomic
+def rank_recipes(full=False, batch_size=1000):
+    """
+    Учитывает события с момента предыдущего запуска (или все при full),
+    сохраняет запуск и сбрасывает кеш ответов со списками рецептов.
+    Возвращает созданный RankingRun.
+    """
+    now = timezone.now()
+    last_run = None if full else RankingRun.objects.first()
+    if last_run is None:
+        RecipeRanking.objects.all().delete()
+        since, epoch = None, now
+    else:
+        since, epoch = last_run.processed_until, last_run.epoch
+    epoch = rebase(epoch, now)
+    scores, total = collect_events(since, now, epoch)
+    store_scores(scores, batch_size)
+    refresh_popular(batch_size)
+    bump_generation('recipe')
+    return RankingRun.objects.create(
+        processed_until=now,
+        epoch=epoch,
+        events=total
+    )
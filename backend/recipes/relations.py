@@ -0,0 +1,70 @@
+from recipes.models import RecipeIngredientRelations, RecipeTagRelations
+
+
+def sync_tags(recipe, tags):
+    """Приводит теги рецепта к переданному списку id одним diff."""
+    submitted = {int(tag) for tag in tags}
+    current = set(
+        RecipeTagRelations.objects.filter(
+            recipe=recipe
+        ).values_list('tag_id', flat=True)
+    )
+    removed = current - submitted
+    if removed:
+        RecipeTagRelations.objects.filter(
+            recipe=recipe,
+            tag_id__in=removed
+        ).delete()
+    RecipeTagRelations.objects.bulk_create(
+        RecipeTagRelations(tag_id=tag, recipe=recipe)
+        for tag in submitted - current
+    )
+
+
+def sync_ingredients(recipe, ingredients):
+    """
+    Приводит ингредиенты рецепта к переданному списку: новые связи
+    создаются, изменённые количества обновляются, лишние удаляются.
+    Возвращает изменения количества по ингредиентам.
+    """
+    submitted = {
+        int(ingredient['id']): int(ingredient['amount'])
+        for ingredient in ingredients
+    }
+    current = {
+        relation.ingredient_id: relation
+        for relation in RecipeIngredientRelations.objects.filter(
+            recipe=recipe
+        )
+    }
+    removed = current.keys() - submitted.keys()
+    if removed:
+        RecipeIngredientRelations.objects.filter(
+            recipe=recipe,
+            ingredient_id__in=removed
+        ).delete()
+    RecipeIngredientRelations.objects.bulk_create(
+        RecipeIngredientRelations(
+            ingredient_id=ingredient,
+            recipe=recipe,
+            amount=amount
+        )
+        for ingredient, amount in submitted.items()
+        if ingredient not in current
+    )
+    deltas = {
+        ingredient: amount
+        for ingredient, amount in submitted.items()
+        if ingredient not in current
+    }
+    changed = []
+    for ingredient, relation in current.items():
+        amount = submitted.get(ingredient, 0)
+        if relation.amount != amount:
+            deltas[ingredient] = amount - relation.amount
+        if amount and relation.amount != amount:
+            relation.amount = amount
+            changed.append(relation)
+    if changed:
+        RecipeIngredientRelations.objects.bulk_update(changed, ('amount',))
+    return deltas
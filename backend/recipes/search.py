@@ -0,0 +1,156 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Lower
+
+from recipes.catalog import ingredient_catalog
+from recipes.models import Ingredient, Recipe
+
+PREFIX_MATCH = 0
+SUBSTRING_MATCH = 1
+
+POSTGRESQL_INDEXES = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm;',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_lower_idx '
+    'ON recipes_ingredient (LOWER(name) text_pattern_ops);',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredient_name_trgm_idx '
+    'ON recipes_ingredient USING gin (LOWER(name) gin_trgm_ops);',
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_idx '
+    'ON recipes_recipe USING gin (search_vector);',
+)
+RECIPE_FTS_TABLE = 'recipes_recipe_fts'
+SQLITE_STATEMENTS = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {RECIPE_FTS_TABLE} '
+    "USING fts5(name, text, tokenize='unicode61 remove_diacritics 2');",
+)
+SEARCH_CONFIG = 'russian'
+SEARCH_TOKENS = re.compile(r'\w+')
+
+
+class IngredientSearch:
+    """
+    Поиск ингредиентов: сначала совпадения по началу названия,
+    затем по вхождению. Результат ограничен INGREDIENT_SEARCH_LIMIT.
+    """
+    def __init__(self, limit=None):
+        self.limit = limit or settings.INGREDIENT_SEARCH_LIMIT
+
+    def search(self, name):
+        if (settings.INGREDIENT_CATALOG_IN_MEMORY
+                or connection.vendor != 'postgresql'):
+            return ingredient_catalog.search(name, self.limit)
+        return list(self.database_search(name.strip().lower()))
+
+    def database_search(self, name):
+        return Ingredient.objects.annotate(
+            name_lower=Lower('name')
+        ).filter(
+            name_lower__contains=name
+        ).annotate(
+            match=Case(
+                When(name_lower__startswith=name, then=Value(PREFIX_MATCH)),
+                default=Value(SUBSTRING_MATCH),
+                output_field=IntegerField()
+            )
+        ).order_by('match', 'name')[:self.limit]
+
+
+class RecipeSearch:
+    """
+    Полнотекстовый поиск рецептов по названию и описанию с ранжированием.
+    В PostgreSQL используется столбец search_vector с GIN-индексом,
+    в SQLite — таблица FTS5, которую поддерживают сигналы.
+    """
+    def search(self, queryset, query):
+        if connection.vendor == 'postgresql':
+            return self.postgresql_search(queryset, query)
+        if connection.vendor == 'sqlite':
+            return self.sqlite_search(queryset, query)
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        )
+
+    def postgresql_search(self, queryset, query):
+        query = SearchQuery(query, config=SEARCH_CONFIG)
+        return queryset.annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).filter(search_vector=query).order_by('-search_rank', '-id')
+
+    def sqlite_search(self, queryset, query):
+        tokens = SEARCH_TOKENS.findall(query.lower())
+        if not tokens:
+            return queryset.none()
+        match = ' '.join(f'"{token}"*' for token in tokens)
+        table = Recipe._meta.db_table
+        return queryset.extra(
+            select={'search_rank': (
+                f'SELECT -bm25({RECIPE_FTS_TABLE}, 10.0, 1.0) '
+                f'FROM {RECIPE_FTS_TABLE} WHERE {RECIPE_FTS_TABLE} '
+                f'MATCH %s AND rowid = {table}.id'
+            )},
+            select_params=(match,),
+            where=(
+                f'{table}.id IN (SELECT rowid FROM {RECIPE_FTS_TABLE} '
+                f'WHERE {RECIPE_FTS_TABLE} MATCH %s)',
+            ),
+            params=(match,)
+        ).order_by('-search_rank', '-id')
+
+
+def update_search_index(recipe_ids):
+    """Пересчитывает поисковый индекс для перечисленных рецептов."""
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    if connection.vendor == 'postgresql':
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            search_vector=(
+                SearchVector('name', weight='A', config=SEARCH_CONFIG)
+                + SearchVector('text', weight='B', config=SEARCH_CONFIG)
+            )
+        )
+    elif connection.vendor == 'sqlite':
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {RECIPE_FTS_TABLE} '
+                f'WHERE rowid IN ({placeholders})',
+                recipe_ids
+            )
+            cursor.execute(
+                f'INSERT INTO {RECIPE_FTS_TABLE} (rowid, name, text) '
+                f'SELECT id, name, text FROM {Recipe._meta.db_table} '
+                f'WHERE id IN ({placeholders})',
+                recipe_ids
+            )
+
+
+def remove_from_search_index(recipe_id):
+    """Удаляет рецепт из таблицы FTS5; в PostgreSQL вектор удаляется с ним."""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {RECIPE_FTS_TABLE} WHERE rowid = %s',
+                (recipe_id,)
+            )
+
+
+def rebuild_search_index(batch_size):
+    """Заполняет поисковый индекс для всех рецептов пачками."""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {RECIPE_FTS_TABLE}')
+    recipe_ids = Recipe.objects.order_by('pk').values_list('pk', flat=True)
+    total = 0
+    last_id = 0
+    while True:
+        batch = list(recipe_ids.filter(pk__gt=last_id)[:batch_size])
+        if not batch:
+            return total
+        update_search_index(batch)
+        total += len(batch)
+        last_id = batch[-1]
@@ -1,24 +1,35 @@
-import base64
-
-from django.core.files.base import ContentFile
-from django.shortcuts import get_object_or_404
+from django.db import transaction
 from rest_framework.serializers import (CharField,
+                                        Field,
                                         ImageField,
                                         ModelSerializer,
                                         SerializerMethodField,
                                         ValidationError)
 from rest_framework.status import HTTP_400_BAD_REQUEST
 
+from recipes.catalog import ingredient_catalog
+from recipes.images import decode_base64_image, variant_names
 from recipes.models import (Favorites,
                             Ingredient,
                             Recipe,
                             RecipeIngredientRelations,
-                            RecipeTagRelations,
                             ShoppingCart,
                             Tag)
+from recipes.relations import sync_ingredients, sync_tags
+from recipes.storage import recipe_variant_storage
+from recipes.totals import change_recipe
+from recipes.viewer import get_viewer_state
 from users.serializers import CustomUserSerializer
 
 
+def parse_id(value):
+    """Приводит id из запроса к int; некорректное значение даёт None."""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
 class TagSerializer(ModelSerializer):
     """Сериализатор для модели Тегов."""
     class Meta:
@@ -48,19 +59,38 @@ class Base64ImageField(ImageField):
     """Класс для добавления изображения при создании рецепта."""
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = decode_base64_image(data.split(';base64,')[-1])
         return super().to_internal_value(data)
 
 
+class ImageVariantsField(Field):
+    """Ссылки на уменьшенные копии картинки рецепта и их WebP-версии."""
+    def __init__(self, **kwargs):
+        kwargs['source'] = 'image'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get('request')
+        variants = variant_names(value.name)
+        for urls in variants.values():
+            for kind, name in urls.items():
+                url = recipe_variant_storage.url(name)
+                urls[kind] = (request.build_absolute_uri(url)
+                              if request else url)
+        return variants
+
+
 class RecipeAnotherSerializer(ModelSerializer):
     """Сериализатор для Рецептов с добавлением времени приготовления."""
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
 class RecipeSerializer(ModelSerializer):
@@ -75,6 +105,7 @@ class RecipeSerializer(ModelSerializer):
     is_favorited = SerializerMethodField()
     is_in_shopping_cart = SerializerMethodField()
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -87,24 +118,21 @@ class RecipeSerializer(ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time'
         )
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = self.initial_data.get('tags')
         ingredients = self.initial_data.get('ingredients')
         recipe = Recipe.objects.create(**validated_data)
-        for tag in tags:
-            RecipeTagRelations.objects.create(tag_id=tag, recipe=recipe)
-        for ingredient in ingredients:
-            RecipeIngredientRelations.objects.create(
-                ingredient_id=ingredient['id'],
-                recipe=recipe,
-                amount=ingredient['amount']
-            )
+        sync_tags(recipe, tags)
+        sync_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         instance.image = validated_data.get('image', instance.image)
         instance.name = validated_data.get('name', instance.name)
@@ -113,32 +141,22 @@ class RecipeSerializer(ModelSerializer):
             'cooking_time',
             instance.cooking_time
         )
-        tags = self.initial_data.get('tags')
-        RecipeTagRelations.objects.filter(recipe=instance).delete()
-        for tag in tags:
-            RecipeTagRelations.objects.create(tag_id=tag, recipe=instance)
-        ingredients = self.initial_data.get('ingredients')
-        RecipeIngredientRelations.objects.filter(recipe=instance).delete()
-        for ingredient in ingredients:
-            RecipeIngredientRelations.objects.create(
-                ingredient_id=ingredient['id'],
-                recipe=instance,
-                amount=ingredient['amount']
-            )
-        instance.save()
+        instance.save(
+            update_fields=('image', 'name', 'text', 'cooking_time', 'updated')
+        )
+        sync_tags(instance, self.initial_data.get('tags'))
+        deltas = sync_ingredients(
+            instance,
+            self.initial_data.get('ingredients')
+        )
+        change_recipe(instance, deltas)
         return instance
 
     def get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return Favorites.objects.filter(user=user, recipe=obj).exists()
+        return get_viewer_state(self.context).is_favorited(obj.id)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context.get('request').user
-        if user.is_anonymous:
-            return False
-        return ShoppingCart.objects.filter(user=user, recipe=obj).exists()
+        return get_viewer_state(self.context).is_in_shopping_cart(obj.id)
 
     def validate(self, data):
         ingredients = self.initial_data.get('ingredients')
@@ -150,35 +168,21 @@ class RecipeSerializer(ModelSerializer):
                                  'хотя бы один ингредиент.')
                  }
             )
-        list_of_ingredients = []
-        for ingredient in ingredients:
-            current_ingredient = get_object_or_404(
-                Ingredient, pk=ingredient['id']
-            )
-            if current_ingredient in list_of_ingredients:
-                raise ValidationError(
-                    detail='В рецепт уже добавлен такой ингредиент.',
-                    code=HTTP_400_BAD_REQUEST
-                )
-            if int(ingredient['amount']) < 1:
-                raise ValidationError(
-                    {'ingredients': ('Количество ингредиентов в рецепте '
-                                     'должно быть больше или равно одному.')
-                     }
-                )
-            list_of_ingredients.append(current_ingredient)
         if not tags:
             raise ValidationError(
                 {'tags': ('Рецепт обязательно должен быть привязан '
                           'хотя бы к одному тегу.')
                  }
             )
-        array_of_tags = set(tags)
-        if len(array_of_tags) != len(tags):
-            raise ValidationError(
-                detail='Теги в рецепте не должны повторяться.',
-                code=HTTP_400_BAD_REQUEST
-            )
+        errors = {}
+        ingredient_errors = self.check_ingredients(ingredients)
+        if ingredient_errors:
+            errors['ingredients'] = ingredient_errors
+        tag_errors = self.check_tags(tags)
+        if tag_errors:
+            errors['tags'] = tag_errors
+        if errors:
+            raise ValidationError(errors, code=HTTP_400_BAD_REQUEST)
         if int(cooking_time) <= 0:
             raise ValidationError(
                 {'cooking_time': ('Время приготовления блюда должно быть'
@@ -186,6 +190,51 @@ class RecipeSerializer(ModelSerializer):
             )
         return data
 
+    def check_ingredients(self, ingredients):
+        """
+        Проверяет все ингредиенты за один проход и возвращает список
+        ошибок: несуществующие id, повторы и некорректное количество.
+        """
+        errors = []
+        ids = []
+        invalid_amount = False
+        for ingredient in ingredients:
+            ids.append(parse_id(ingredient.get('id')))
+            try:
+                amount = int(ingredient.get('amount'))
+            except (TypeError, ValueError):
+                amount = 0
+            if amount < 1:
+                invalid_amount = True
+        found = ingredient_catalog.in_bulk(pk for pk in ids if pk)
+        missing = [
+            str(ingredient.get('id'))
+            for pk, ingredient in zip(ids, ingredients)
+            if pk not in found
+        ]
+        if missing:
+            errors.append(
+                'Ингредиенты не найдены: ' + ', '.join(missing) + '.'
+            )
+        if len(set(ids)) != len(ids):
+            errors.append('В рецепт уже добавлен такой ингредиент.')
+        if invalid_amount:
+            errors.append('Количество ингредиентов в рецепте '
+                          'должно быть больше или равно одному.')
+        return errors
+
+    def check_tags(self, tags):
+        """Проверяет теги одним запросом и возвращает список ошибок."""
+        errors = []
+        ids = [parse_id(tag) for tag in tags]
+        found = Tag.objects.in_bulk([pk for pk in ids if pk])
+        missing = [str(tag) for pk, tag in zip(ids, tags) if pk not in found]
+        if missing:
+            errors.append('Теги не найдены: ' + ', '.join(missing) + '.')
+        if len(set(ids)) != len(ids):
+            errors.append('Теги в рецепте не должны повторяться.')
+        return errors
+
 
 class FavoritesSerializer(ModelSerializer):
     """Сериализатор для модели Избранного."""
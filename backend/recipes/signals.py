@@ -0,0 +1,183 @@
+from django.db import connection, transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_migrate,
+                                      post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+
+from recipes.cache import bump_generation
+from recipes.counters import change_counter
+from recipes.feed import backfill, prune
+from recipes.images import change_references, schedule_variants
+from recipes.matching import ingredient_index
+from recipes.models import (Favorites, Ingredient, Recipe,
+                            RecipeIngredientRelations, RecipeTagRelations,
+                            ShoppingCart, Tag, User)
+from recipes.search import (POSTGRESQL_INDEXES, SQLITE_STATEMENTS,
+                            remove_from_search_index, update_search_index)
+from recipes.similarity import update_similarity
+from recipes.totals import add_recipe, remove_recipe
+from recipes.viewer import ViewerState
+from users.models import Subscription
+
+GENERATIONS = {
+    Tag: 'tag',
+    Ingredient: 'ingredient',
+    Recipe: 'recipe',
+    RecipeTagRelations: 'recipe',
+    RecipeIngredientRelations: 'recipe',
+    User: 'user',
+}
+IGNORED_FIELDS = {'last_login'}
+
+
+@receiver(post_migrate)
+def create_search_indexes(sender, **kwargs):
+    """
+    Создаёт функциональные и полнотекстовые индексы в PostgreSQL
+    и таблицу FTS5 для поиска рецептов в SQLite.
+    """
+    statements = {
+        'postgresql': POSTGRESQL_INDEXES,
+        'sqlite': SQLITE_STATEMENTS,
+    }.get(connection.vendor)
+    if sender.name != 'recipes' or not statements:
+        return
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+@receiver(post_save, sender=Recipe)
+def index_recipe(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or {'name', 'text'} & set(update_fields):
+        update_search_index((instance.pk,))
+
+
+@receiver(post_delete, sender=Recipe)
+def unindex_recipe(sender, instance, **kwargs):
+    remove_from_search_index(instance.pk)
+
+
+def bump_model_generation(sender, update_fields=None, **kwargs):
+    """Сбрасывает кеш ответов и справочник при изменении модели."""
+    if update_fields and set(update_fields) <= IGNORED_FIELDS:
+        return
+    bump_generation(GENERATIONS[sender])
+
+
+for model in GENERATIONS:
+    post_save.connect(bump_model_generation, sender=model)
+    post_delete.connect(bump_model_generation, sender=model)
+for through in (Recipe.tags.through, Recipe.ingredients.through):
+    m2m_changed.connect(bump_model_generation, sender=through)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_cart_totals(sender, instance, created, **kwargs):
+    if created:
+        add_recipe(instance.user, instance.recipe)
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_cart_totals(sender, instance, **kwargs):
+    remove_recipe(instance.user, instance.recipe)
+
+
+@receiver(post_save, sender=Favorites)
+@receiver(post_delete, sender=Favorites)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def invalidate_viewer_state(sender, instance, **kwargs):
+    ViewerState.invalidate(instance.user_id)
+
+
+def counter_delta(signal, created):
+    if signal is post_delete:
+        return -1
+    return 1 if created else 0
+
+
+@receiver(post_save, sender=Favorites)
+@receiver(post_delete, sender=Favorites)
+def count_favorites(sender, instance, signal, created=False, **kwargs):
+    delta = counter_delta(signal, created)
+    if delta:
+        change_counter(Recipe, instance.recipe_id, 'favorites_count', delta)
+
+
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_delete, sender=ShoppingCart)
+def count_shopping_cart(sender, instance, signal, created=False, **kwargs):
+    delta = counter_delta(signal, created)
+    if delta:
+        change_counter(Recipe, instance.recipe_id, 'in_carts_count', delta)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def count_recipes(sender, instance, signal, created=False, **kwargs):
+    delta = counter_delta(signal, created)
+    if delta:
+        change_counter(User, instance.author_id, 'recipes_count', delta)
+
+
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def count_followers(sender, instance, signal, created=False, **kwargs):
+    delta = counter_delta(signal, created)
+    if delta:
+        change_counter(User, instance.author_id, 'followers_count', delta)
+
+
+@receiver(post_save, sender=Subscription)
+def backfill_timeline(sender, instance, created, **kwargs):
+    if created:
+        backfill(instance.user_id, instance.author)
+
+
+@receiver(post_delete, sender=Subscription)
+def prune_timeline(sender, instance, **kwargs):
+    prune(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_image(sender, instance, update_fields=None, **kwargs):
+    """Запоминает прежнюю картинку рецепта для подсчёта ссылок."""
+    instance._previous_image = instance.image.name
+    if instance.pk and (update_fields is None or 'image' in update_fields):
+        instance._previous_image = Recipe.objects.filter(
+            pk=instance.pk
+        ).values_list('image', flat=True).first()
+
+
+@receiver(post_save, sender=Recipe)
+def create_image_variants(sender, instance, created, **kwargs):
+    previous = None if created else instance._previous_image
+    if previous == instance.image.name:
+        return
+    change_references(instance.image.name, 1)
+    change_references(previous, -1)
+    schedule_variants(instance.image.name)
+
+
+@receiver(post_delete, sender=Recipe)
+def release_image(sender, instance, **kwargs):
+    change_references(instance.image.name, -1)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def reindex_recipe_ingredients(sender, instance, **kwargs):
+    ingredient_index.mark_changed(instance.pk)
+
+
+@receiver(post_save, sender=RecipeIngredientRelations)
+@receiver(post_delete, sender=RecipeIngredientRelations)
+def reindex_ingredient_relation(sender, instance, **kwargs):
+    ingredient_index.mark_changed(instance.recipe_id)
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_similar_recipes(sender, instance, **kwargs):
+    transaction.on_commit(lambda: update_similarity(instance.pk))
@@ -0,0 +1,168 @@
+import heapq
+import random
+from collections import defaultdict
+from functools import reduce
+from itertools import chain
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Q
+
+from recipes.models import (RecipeIngredientRelations, RecipeTagRelations,
+                            SimilarityBucket, SimilarRecipe)
+
+PRIME = (1 << 61) - 1
+BANDS = 24
+ROWS = 3
+MAX_BUCKET_CANDIDATES = 100
+_random = random.Random(20230301)
+PERMUTATIONS = tuple(
+    (_random.randrange(1, PRIME), _random.randrange(PRIME))
+    for _ in range(BANDS * ROWS)
+)
+
+
+def load_features(recipe_ids=None):
+    """
+    Признаки рецептов: чётные коды — ингредиенты, нечётные — теги.
+    Возвращает словарь {id рецепта: множество кодов}.
+    """
+    features = defaultdict(set)
+    for model, field, offset in ((RecipeIngredientRelations,
+                                  'ingredient_id', 0),
+                                 (RecipeTagRelations, 'tag_id', 1)):
+        rows = model.objects.values_list('recipe_id', field).order_by()
+        if recipe_ids is not None:
+            rows = rows.filter(recipe_id__in=recipe_ids)
+        for recipe_id, value in rows.iterator(chunk_size=10000):
+            features[recipe_id].add(value * 2 + offset)
+    return features
+
+
+def band_buckets(features):
+    """MinHash-подпись признаков, разбитая на BANDS полос по ROWS строк."""
+    signature = [
+        min((a * feature + b) % PRIME for feature in features)
+        for a, b in PERMUTATIONS
+    ]
+    buckets = []
+    for band in range(BANDS):
+        value = band
+        for row in signature[band * ROWS:(band + 1) * ROWS]:
+            value = (value * 1000003 + row) % PRIME
+        buckets.append((band, value))
+    return buckets
+
+
+def jaccard(first, second):
+    return len(first & second) / len(first | second)
+
+
+def scored(recipe_id, candidates, features):
+    """Пары (сходство, id) для кандидатов с ненулевым сходством."""
+    own = features[recipe_id]
+    pairs = (
+        (jaccard(own, features[candidate]), candidate)
+        for candidate in candidates
+        if candidate != recipe_id and candidate in features
+    )
+    return [(score, candidate) for score, candidate in pairs if score]
+
+
+def build_similarity(batch_size):
+    """
+    Пересчитывает корзины LSH и списки похожих рецептов для всех рецептов.
+    Возвращает количество обработанных рецептов.
+    """
+    limit = settings.SIMILAR_RECIPES_LIMIT
+    features = load_features()
+    buckets = defaultdict(list)
+    recipe_buckets = {}
+    for recipe_id, recipe_features in features.items():
+        recipe_buckets[recipe_id] = band_buckets(recipe_features)
+        for key in recipe_buckets[recipe_id]:
+            buckets[key].append(recipe_id)
+    with transaction.atomic():
+        SimilarityBucket.objects.all().delete()
+        SimilarRecipe.objects.all().delete()
+        SimilarityBucket.objects.bulk_create(
+            (SimilarityBucket(recipe_id=recipe_id, band=band, bucket=bucket)
+             for recipe_id, keys in recipe_buckets.items()
+             for band, bucket in keys),
+            batch_size=batch_size
+        )
+        SimilarRecipe.objects.bulk_create(
+            (SimilarRecipe(recipe_id=recipe_id, similar_id=similar,
+                           score=score)
+             for recipe_id, keys in recipe_buckets.items()
+             for score, similar in heapq.nlargest(limit, scored(
+                 recipe_id,
+                 set(chain.from_iterable(
+                     buckets[key][-MAX_BUCKET_CANDIDATES:] for key in keys
+                 )),
+                 features
+             ))),
+            batch_size=batch_size
+        )
+    return len(features)
+
+
+@transaction.atomic
+def update_similarity(recipe_id):
+    """
+    Пересчитывает похожие рецепты для одного рецепта по его корзинам LSH
+    и добавляет его в списки соседей, если он ближе их худшего соседа.
+    """
+    SimilarityBucket.objects.filter(recipe_id=recipe_id).delete()
+    SimilarRecipe.objects.filter(
+        Q(recipe_id=recipe_id) | Q(similar_id=recipe_id)
+    ).delete()
+    features = load_features((recipe_id,))
+    if recipe_id not in features:
+        return
+    keys = band_buckets(features[recipe_id])
+    SimilarityBucket.objects.bulk_create(
+        SimilarityBucket(recipe_id=recipe_id, band=band, bucket=bucket)
+        for band, bucket in keys
+    )
+    candidates = set(SimilarityBucket.objects.filter(reduce(or_, (
+        Q(band=band, bucket=bucket) for band, bucket in keys
+    ))).exclude(recipe_id=recipe_id).values_list(
+        'recipe_id', flat=True
+    )[:MAX_BUCKET_CANDIDATES * BANDS])
+    features.update(load_features(candidates))
+    neighbours = scored(recipe_id, candidates, features)
+    limit = settings.SIMILAR_RECIPES_LIMIT
+    SimilarRecipe.objects.bulk_create(
+        SimilarRecipe(recipe_id=recipe_id, similar_id=similar, score=score)
+        for score, similar in heapq.nlargest(limit, neighbours)
+    )
+    add_to_neighbours(recipe_id, neighbours, limit)
+
+
+def add_to_neighbours(recipe_id, neighbours, limit):
+    """Вставляет рецепт в top-K соседей и обрезает их списки до limit."""
+    current = {
+        row['recipe_id']: row
+        for row in SimilarRecipe.objects.filter(
+            recipe_id__in=[similar for _, similar in neighbours]
+        ).values('recipe_id').annotate(total=Count('id'), lowest=Min('score'))
+    }
+    added = [
+        SimilarRecipe(recipe_id=similar, similar_id=recipe_id, score=score)
+        for score, similar in neighbours
+        if similar not in current
+        or current[similar]['total'] < limit
+        or score > current[similar]['lowest']
+    ]
+    SimilarRecipe.objects.bulk_create(added)
+    for row in added:
+        if row.recipe_id in current and (
+            current[row.recipe_id]['total'] >= limit
+        ):
+            SimilarRecipe.objects.filter(pk__in=list(
+                SimilarRecipe.objects.filter(
+                    recipe_id=row.recipe_id
+                ).order_by('score', 'id').values_list('pk', flat=True)[:1]
+            )).delete()
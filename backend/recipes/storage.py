@@ -0,0 +1,57 @@
+import os
+import tempfile
+from hashlib import sha256
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class OverwriteStorage(FileSystemStorage):
+    """
+    Хранилище, которое сохраняет файл под переданным именем,
+    записывая его во временный файл и атомарно подменяя старый.
+    """
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        descriptor, temp_path = tempfile.mkstemp(
+            dir=os.path.dirname(full_path),
+            suffix='.part'
+        )
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                content.seek(0)
+                for chunk in content.chunks():
+                    file.write(chunk)
+            os.chmod(temp_path, self.file_permissions_mode or 0o644)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return name
+
+
+@deconstructible
+class ContentAddressedStorage(OverwriteStorage):
+    """
+    Хранилище, в котором имя файла — SHA-256 его содержимого.
+    Одинаковые файлы хранятся один раз, повторная запись пропускается.
+    """
+    def _save(self, name, content):
+        digest = sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        name = os.path.join(directory, digest.hexdigest() + extension)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+recipe_image_storage = ContentAddressedStorage()
+recipe_variant_storage = OverwriteStorage()
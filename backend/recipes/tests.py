@@ -0,0 +1,349 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.catalog import ingredient_catalog, tag_catalog
+from recipes.exporters import shopping_list_etag
+from recipes.matching import IngredientIndex
+from recipes.models import (Favorites, Ingredient, Recipe,
+                            RecipeIngredientRelations, ShoppingCart,
+                            ShoppingCartTotal, Tag, TimelineEntry)
+from recipes.totals import live_totals
+from users.models import Subscription, User
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+})
+class RecipeDataTestCase(TestCase):
+    """
+    Базовый класс с общим набором данных: пользователь подписан на трёх
+    авторов, первые три из девяти рецептов у него в избранном и корзине.
+    Кеш — локальный для тестов.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='reader', email='reader@example.com',
+            first_name='Читатель', last_name='Читателев'
+        )
+        cls.authors = [
+            User.objects.create(
+                username=f'author{number}',
+                email=f'author{number}@example.com',
+                first_name='Автор', last_name=str(number)
+            )
+            for number in range(3)
+        ]
+        cls.tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', color=f'#00000{number}',
+                slug=f'tag-{number}'
+            )
+            for number in range(2)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'ингредиент {number}', measurement_unit='г'
+            )
+            for number in range(4)
+        ]
+        cls.recipes = []
+        for number in range(9):
+            recipe = Recipe.objects.create(
+                author=cls.authors[number % 3],
+                name=f'Рецепт {number}',
+                text='Описание',
+                cooking_time=10,
+                image='recipes/image.png'
+            )
+            recipe.tags.set(cls.tags[:number % 2 + 1])
+            RecipeIngredientRelations.objects.bulk_create(
+                RecipeIngredientRelations(
+                    recipe=recipe, ingredient=ingredient, amount=number + 1
+                )
+                for ingredient in cls.ingredients[:number % 3 + 2]
+            )
+            cls.recipes.append(recipe)
+        for recipe in cls.recipes[:3]:
+            Favorites.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        for author in cls.authors:
+            Subscription.objects.create(user=cls.user, author=author)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class QueryCountTestCase(RecipeDataTestCase):
+    """
+    Базовый класс для проверок числа SQL-запросов. Перед каждым
+    замером очищаются кеш ответов и справочники в памяти процесса,
+    чтобы запрос шёл до базы данных.
+    """
+    def assert_queries(self, count, url, client=None):
+        cache.clear()
+        ingredient_catalog.snapshot = None
+        tag_catalog.snapshot = (None, {})
+        with self.assertNumQueries(count):
+            response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def assert_flags(self, recipes, anonymous=False):
+        """Проверяет флаги пользователя в сериализованных рецептах."""
+        marked = {recipe.id for recipe in self.recipes[:3]}
+        for recipe in recipes:
+            expected = recipe['id'] in marked and not anonymous
+            self.assertIs(recipe['is_favorited'], expected)
+            self.assertIs(recipe['is_in_shopping_cart'], expected)
+            self.assertIs(recipe['author']['is_subscribed'], not anonymous)
+
+
+class RecipeQueryCountTests(QueryCountTestCase):
+    """Число запросов эндпоинтов рецептов не зависит от размера страницы."""
+    def test_list(self):
+        for limit in (2, 6):
+            with self.subTest(limit=limit):
+                response = self.assert_queries(
+                    10, f'/api/recipes/?limit={limit}'
+                )
+                self.assertEqual(len(response.data['results']), limit)
+                self.assert_flags(response.data['results'])
+
+    def test_list_last_page(self):
+        response = self.assert_queries(10, '/api/recipes/?limit=6&page=2')
+        self.assert_flags(response.data['results'])
+
+    def test_list_anonymous(self):
+        for limit in (2, 6):
+            with self.subTest(limit=limit):
+                response = self.assert_queries(
+                    6, f'/api/recipes/?limit={limit}', APIClient()
+                )
+                self.assert_flags(response.data['results'], anonymous=True)
+
+    def test_list_cursor(self):
+        for limit in (2, 6):
+            with self.subTest(limit=limit):
+                response = self.assert_queries(
+                    9, f'/api/recipes/?pagination=cursor&limit={limit}'
+                )
+                self.assert_flags(response.data['results'])
+
+    def test_retrieve(self):
+        for recipe in self.recipes[2:5]:
+            with self.subTest(recipe=recipe.id):
+                response = self.assert_queries(
+                    9, f'/api/recipes/{recipe.id}/'
+                )
+                self.assert_flags([response.data])
+
+
+class IngredientQueryCountTests(QueryCountTestCase):
+    """
+    Ингредиенты отдаются из справочника: один запрос за данными и три
+    чтения поколений (ETag, ключ кеша ответа, версия справочника).
+    """
+    def test_list(self):
+        self.assert_queries(4, '/api/ingredients/')
+
+    def test_search(self):
+        for name in ('ингр', 'ингредиент 1'):
+            with self.subTest(name=name):
+                self.assert_queries(4, f'/api/ingredients/?name={name}')
+
+    def test_retrieve(self):
+        self.assert_queries(
+            4, f'/api/ingredients/{self.ingredients[0].id}/'
+        )
+
+
+class ShoppingCartTotalsTests(RecipeDataTestCase):
+    """Итоги корзины совпадают с посчитанными по живым данным."""
+    def assert_totals(self):
+        self.assertEqual(
+            set(ShoppingCartTotal.objects.values_list(
+                'user', 'ingredient', 'amount'
+            )),
+            set(live_totals())
+        )
+
+    def test_add_edit_remove(self):
+        recipe = self.recipes[4]
+        self.assert_totals()
+        response = self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 201)
+        self.assert_totals()
+        author = APIClient()
+        author.force_authenticate(recipe.author)
+        response = author.patch(f'/api/recipes/{recipe.id}/', {
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'tags': [self.tags[0].id],
+            'ingredients': [
+                {'id': self.ingredients[0].id, 'amount': 50},
+                {'id': self.ingredients[3].id, 'amount': 7},
+            ],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_totals()
+        response = self.client.delete(
+            f'/api/recipes/{recipe.id}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assert_totals()
+
+    def test_remove_after_untracked_edit(self):
+        recipe = self.recipes[0]
+        relation = RecipeIngredientRelations.objects.filter(
+            recipe=recipe
+        ).first()
+        relation.amount += 100
+        relation.save()
+        response = self.client.delete(
+            f'/api/recipes/{recipe.id}/shopping_cart/'
+        )
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(ShoppingCartTotal.objects.filter(
+            amount__lte=0
+        ).exists())
+
+
+class ShoppingListEtagTests(RecipeDataTestCase):
+    """ETag списка покупок различает списки с равными суммами."""
+    def test_different_lists(self):
+        first, second = self.authors[:2]
+        ids = [ingredient.id for ingredient in self.ingredients]
+        for user, amounts in ((first, (2, 1, 0, 1)), (second, (1, 2, 1, 0))):
+            ShoppingCartTotal.objects.bulk_create(
+                ShoppingCartTotal(user=user, ingredient_id=ingredient,
+                                  amount=amount)
+                for ingredient, amount in zip(ids, amounts) if amount
+            )
+        self.assertNotEqual(
+            shopping_list_etag(
+                ShoppingCartTotal.objects.filter(user=first), 'txt'
+            ),
+            shopping_list_etag(
+                ShoppingCartTotal.objects.filter(user=second), 'txt'
+            )
+        )
+
+
+class IngredientMatchTests(RecipeDataTestCase):
+    """Подбор по ингредиентам совпадает с перебором по связям рецептов."""
+    def expected(self, available):
+        recipes = {}
+        relations = RecipeIngredientRelations.objects.values_list(
+            'recipe_id', 'ingredient_id'
+        )
+        for recipe_id, ingredient_id in relations:
+            recipes.setdefault(recipe_id, set()).add(ingredient_id)
+        matches = []
+        for recipe_id, ingredients in recipes.items():
+            count = len(ingredients & available)
+            if count:
+                matches.append({
+                    'recipe_id': recipe_id,
+                    'coverage': round(count / len(ingredients), 4),
+                    'missing': len(ingredients) - count,
+                })
+        return sorted(matches, key=lambda match: (
+            -match['coverage'], match['missing'], -match['recipe_id']
+        ))
+
+    def test_match(self):
+        ids = [ingredient.id for ingredient in self.ingredients]
+        for available in ({ids[0]}, {ids[3]}, set(ids[1:3]),
+                          set(ids), {ids[2], 0}, {0}):
+            with self.subTest(available=available):
+                expected = self.expected(available)
+                matches = IngredientIndex().match(available)
+                self.assertEqual(len(matches), len(expected))
+                self.assertEqual(matches[0:len(expected)], expected)
+                pages = []
+                for start in range(0, len(expected), 2):
+                    pages.extend(matches[start:start + 2])
+                self.assertEqual(pages, expected)
+
+
+class FeedTests(RecipeDataTestCase):
+    """Лента по курсору отдаёт все рецепты подписок в порядке -id."""
+    def walk(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([recipe['id'] for recipe in response.data['results']])
+            url = response.data['next']
+        return pages
+
+    def check_feed(self):
+        expected = sorted((recipe.id for recipe in self.recipes), reverse=True)
+        pages = self.walk('/api/recipes/feed/?limit=2')
+        self.assertEqual(sum(pages, []), expected)
+        self.assertTrue(all(len(page) == 2 for page in pages[:-1]))
+        response = self.client.get('/api/recipes/feed/?limit=2')
+        response = self.client.get(response.data['next'])
+        response = self.client.get(response.data['previous'])
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            expected[:2]
+        )
+
+    def test_timeline(self):
+        self.check_feed()
+
+    @override_settings(FEED_FANOUT_THRESHOLD=1)
+    def test_celebrities(self):
+        TimelineEntry.objects.all().delete()
+        self.check_feed()
+
+    def test_filtered(self):
+        tagged = sorted(
+            (recipe.id for recipe in self.recipes
+             if recipe.tags.filter(slug='tag-1').exists()),
+            reverse=True
+        )
+        pages = self.walk('/api/recipes/feed/?limit=2&tags=tag-1')
+        self.assertEqual(sum(pages, []), tagged)
+
+
+class TagsFilterTests(RecipeDataTestCase):
+    """Фильтр по тегам: любой из тегов, все теги, неизвестные slug."""
+    def filtered(self, query):
+        response = self.client.get(f'/api/recipes/?limit=20&{query}')
+        self.assertEqual(response.status_code, 200)
+        return sorted(recipe['id'] for recipe in response.data['results'])
+
+    def tagged(self, *slugs, all_tags=False):
+        check = all if all_tags else any
+        return sorted(
+            recipe.id for recipe in self.recipes
+            if check(recipe.tags.filter(slug=slug).exists() for slug in slugs)
+        )
+
+    def test_any(self):
+        self.assertEqual(self.filtered('tags=tag-1'), self.tagged('tag-1'))
+        self.assertEqual(
+            self.filtered('tags=tag-0&tags=tag-1'),
+            self.tagged('tag-0', 'tag-1')
+        )
+
+    def test_all(self):
+        self.assertEqual(
+            self.filtered('tags=tag-0&tags=tag-1&tags_mode=all'),
+            self.tagged('tag-0', 'tag-1', all_tags=True)
+        )
+
+    def test_unknown_slugs(self):
+        self.assertEqual(self.filtered('tags=missing'), [])
+        self.assertEqual(
+            self.filtered('tags=tag-1&tags=missing'), self.tagged('tag-1')
+        )
+        self.assertEqual(
+            self.filtered('tags=tag-1&tags=missing&tags_mode=all'), []
+        )
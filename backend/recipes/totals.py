@@ -0,0 +1,80 @@
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+
+from recipes.models import (RecipeIngredientRelations, ShoppingCart,
+                            ShoppingCartTotal)
+
+
+def recipe_amounts(recipe):
+    return dict(
+        RecipeIngredientRelations.objects.filter(
+            recipe=recipe
+        ).values_list('ingredient_id', 'amount')
+    )
+
+
+@transaction.atomic
+def apply_deltas(user_ids, deltas):
+    """
+    Прибавляет к итогам корзины пользователей изменения количества
+    ингредиентов deltas ({ingredient_id: delta}). Итог не опускается
+    ниже нуля, даже если разошёлся с рецептами; обнулённые строки
+    удаляются.
+    """
+    deltas = {ingredient: delta for ingredient, delta in deltas.items()
+              if delta}
+    user_ids = list(user_ids)
+    if not deltas or not user_ids:
+        return
+    totals = ShoppingCartTotal.objects.filter(
+        user_id__in=user_ids,
+        ingredient_id__in=deltas
+    )
+    existing = set()
+    changed = []
+    for total in totals.select_for_update().only('id', 'user', 'ingredient'):
+        existing.add((total.user_id, total.ingredient_id))
+        total.amount = Greatest(F('amount') + deltas[total.ingredient_id], 0)
+        changed.append(total)
+    if changed:
+        ShoppingCartTotal.objects.bulk_update(changed, ('amount',))
+    ShoppingCartTotal.objects.bulk_create(
+        ShoppingCartTotal(user_id=user, ingredient_id=ingredient,
+                          amount=delta)
+        for user in user_ids
+        for ingredient, delta in deltas.items()
+        if delta > 0 and (user, ingredient) not in existing
+    )
+    totals.filter(amount__lte=0).delete()
+
+
+def add_recipe(user, recipe):
+    apply_deltas((user.id,), recipe_amounts(recipe))
+
+
+def remove_recipe(user, recipe):
+    apply_deltas(
+        (user.id,),
+        {ingredient: -amount
+         for ingredient, amount in recipe_amounts(recipe).items()}
+    )
+
+
+def change_recipe(recipe, deltas):
+    """Переносит изменение ингредиентов рецепта в корзины с этим рецептом."""
+    apply_deltas(
+        ShoppingCart.objects.filter(
+            recipe=recipe
+        ).values_list('user_id', flat=True),
+        deltas
+    )
+
+
+def live_totals():
+    """Итоги корзин, посчитанные по живым данным."""
+    return RecipeIngredientRelations.objects.filter(
+        recipe__shopping_cart__isnull=False
+    ).values_list(
+        'recipe__shopping_cart__user', 'ingredient'
+    ).annotate(total=Sum('amount')).order_by()
@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.core.cache import cache
+
+from recipes.cache import bump_generation, get_generation
+from recipes.models import Favorites, ShoppingCart
+from users.models import Subscription
+
+VIEWER_STATE_KEY = 'recipes:viewer:{}:{}'
+VIEWER_GENERATION = 'viewer:{}'
+
+
+class ViewerState:
+    """
+    Избранное, корзина и подписки текущего пользователя в виде множеств id.
+    Загружается тремя запросами один раз на запрос, после чего флаги
+    is_favorited, is_in_shopping_cart и is_subscribed проверяются за O(1).
+    """
+    def __init__(self, favorites=(), shopping_cart=(), subscriptions=()):
+        self.favorites = frozenset(favorites)
+        self.shopping_cart = frozenset(shopping_cart)
+        self.subscriptions = frozenset(subscriptions)
+
+    @classmethod
+    def for_user(cls, user):
+        if user.is_anonymous:
+            return cls()
+        timeout = settings.VIEWER_STATE_CACHE_TIMEOUT
+        state = None
+        if timeout:
+            key = VIEWER_STATE_KEY.format(user.id, cls.version(user))
+            state = cache.get(key)
+        if state is None:
+            state = cls(
+                Favorites.objects.filter(
+                    user=user
+                ).values_list('recipe_id', flat=True),
+                ShoppingCart.objects.filter(
+                    user=user
+                ).values_list('recipe_id', flat=True),
+                Subscription.objects.filter(
+                    user=user
+                ).values_list('author_id', flat=True)
+            )
+            if timeout:
+                cache.set(key, state, timeout=timeout)
+        return state
+
+    @staticmethod
+    def invalidate(user_id):
+        """
+        Увеличивает версию состояния: она входит в ключ кеша, поэтому
+        состояние, прочитанное до фиксации изменений, больше не выдаётся.
+        """
+        bump_generation(VIEWER_GENERATION.format(user_id))
+
+    @staticmethod
+    def generation_names(user):
+        """Имена поколений, от которых зависит состояние пользователя."""
+        if user.is_anonymous:
+            return ()
+        return (VIEWER_GENERATION.format(user.id),)
+
+    @staticmethod
+    def version(user):
+        """Номер версии состояния, меняющийся при каждой инвалидации."""
+        if user.is_anonymous:
+            return 0
+        return get_generation(VIEWER_GENERATION.format(user.id))
+
+    def is_favorited(self, recipe_id):
+        return recipe_id in self.favorites
+
+    def is_in_shopping_cart(self, recipe_id):
+        return recipe_id in self.shopping_cart
+
+    def is_subscribed(self, author_id):
+        return author_id in self.subscriptions
+
+
+EMPTY_STATE = ViewerState()
+
+
+def get_viewer_state(context):
+    """
+    Возвращает состояние пользователя из контекста сериализатора.
+    Для общего (кешируемого) представления флаги всегда ложны.
+    """
+    request = context.get('request')
+    if request is None or context.get('shared'):
+        return EMPTY_STATE
+    state = getattr(request, 'viewer_state', None)
+    if state is None:
+        state = ViewerState.for_user(request.user)
+        request.viewer_state = state
+    return state
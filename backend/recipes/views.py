@@ -1,55 +1,72 @@
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.http import Http404, HttpResponseNotModified
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action
-from rest_framework.filters import SearchFilter
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.status import (HTTP_201_CREATED, HTTP_204_NO_CONTENT,
                                    HTTP_400_BAD_REQUEST)
 from rest_framework.viewsets import ReadOnlyModelViewSet
 
+from recipes.catalog import ingredient_catalog
+from recipes.exporters import (EXPORTERS, ExportContentNegotiation,
+                               shopping_list_etag)
+from recipes.feed import fan_out, feed_queryset
 from recipes.filters import RecipeFilterSet
-from recipes.mixins import CustomRecipeViewSet
-from recipes.models import Favorites, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.matching import ingredient_index
+from recipes.mixins import (CachedResponseMixin, ConditionalResponseMixin,
+                            CursorPaginationMixin, CustomRecipeViewSet)
+from recipes.models import (Favorites, Ingredient, Recipe, ShoppingCart,
+                            ShoppingCartTotal, Tag)
+from recipes.pagination import CustomCursorPagination, CustomPagination
 from recipes.permissions import IsAuthorOrReadOnly
+from recipes.search import IngredientSearch
 from recipes.serializers import (IngredientSerializer,
                                  FavoritesSerializer,
-                                 RecipeIngredientRelations,
+                                 RecipeAnotherSerializer,
                                  RecipeSerializer,
                                  ShoppingCartSerializer,
-                                 TagSerializer)
+                                 TagSerializer,
+                                 parse_id)
+from recipes.viewer import get_viewer_state
 
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ConditionalResponseMixin,
+                 CachedResponseMixin,
+                 ReadOnlyModelViewSet):
     """Вьюсет для модели Тегов."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    cache_models = ('tag',)
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalResponseMixin,
+                        CachedResponseMixin,
+                        ReadOnlyModelViewSet):
     """Вьюсет для модели Ингредиентов."""
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     pagination_class = None
-    filter_backends = (SearchFilter,)
-    search_fields = ('^name',)
+    cache_models = ('ingredient',)
+
+    def get_object(self):
+        ingredient = ingredient_catalog.get(self.kwargs['pk'])
+        if ingredient is None:
+            raise Http404
+        return ingredient
 
     def get_queryset(self):
-        name = self.request.query_params['name'].lower()
-        starts_with_queryset = list(
-            self.queryset.filter(name__istartswith=name)
-        )
-        cont_queryset = self.queryset.filter(name__icontains=name)
-        starts_with_queryset.extend(
-            [x for x in cont_queryset if x not in starts_with_queryset]
-        )
-        return starts_with_queryset
+        name = self.request.query_params.get('name')
+        if name:
+            return IngredientSearch().search(name)
+        return ingredient_catalog.all()
 
 
-class RecipeViewSet(CustomRecipeViewSet):
+class RecipeViewSet(ConditionalResponseMixin,
+                    CachedResponseMixin,
+                    CursorPaginationMixin,
+                    CustomRecipeViewSet):
     """
     Вьюсет для модели Рецептов с обработкой запросов для добавления рецептов
     в избранное и корзину, а также для скачивания списка покупок.
@@ -59,9 +76,90 @@ class RecipeViewSet(CustomRecipeViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilterSet
     serializer_class = RecipeSerializer
+    cache_models = ('recipe', 'tag', 'ingredient', 'user')
+    private_query_params = ('is_favorited', 'is_in_shopping_cart')
+
+    def get_queryset(self):
+        return Recipe.objects.with_related()
+
+    def personalize(self, data):
+        state = get_viewer_state({'request': self.request})
+        recipes = data['results'] if 'results' in data else [data]
+        for recipe in recipes:
+            recipe['is_favorited'] = state.is_favorited(recipe['id'])
+            recipe['is_in_shopping_cart'] = state.is_in_shopping_cart(
+                recipe['id']
+            )
+            recipe['author']['is_subscribed'] = state.is_subscribed(
+                recipe['author']['id']
+            )
+        return data
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user)
+        fan_out(serializer.save(author=self.request.user))
+
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        url_path='feed'
+    )
+    def feed(self, request):
+        paginator = CustomCursorPagination()
+        recipes = paginator.paginate_queryset(
+            feed_queryset(
+                request.user, self.filter_queryset(self.get_queryset())
+            ),
+            request,
+            view=self
+        )
+        serializer = self.get_serializer(recipes, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(methods=['get'], detail=True, url_path='similar')
+    def similar(self, request, pk):
+        recipes = Recipe.objects.filter(
+            similar_to__recipe_id=pk
+        ).order_by('-similar_to__score', '-id')
+        serializer = RecipeAnotherSerializer(
+            recipes,
+            many=True,
+            context={'request': request}
+        )
+        if not serializer.data:
+            get_object_or_404(Recipe, id=pk)
+        return Response(serializer.data)
+
+    @action(methods=['get'], detail=False, url_path='by_ingredients')
+    def by_ingredients(self, request):
+        ingredient_ids = {
+            parse_id(value)
+            for values in request.query_params.getlist('ids')
+            for value in values.split(',')
+        } - {None}
+        if not ingredient_ids:
+            return Response(
+                {'errors': 'Передайте id ингредиентов в параметре ids.'},
+                status=HTTP_400_BAD_REQUEST
+            )
+        paginator = CustomPagination()
+        matches = paginator.paginate_queryset(
+            ingredient_index.match(ingredient_ids),
+            request,
+            view=self
+        )
+        recipes = self.get_queryset().in_bulk(
+            [match['recipe_id'] for match in matches]
+        )
+        matches = [match for match in matches if match['recipe_id'] in recipes]
+        data = self.get_serializer(
+            [recipes[match['recipe_id']] for match in matches],
+            many=True
+        ).data
+        for recipe, match in zip(data, matches):
+            recipe['coverage'] = match['coverage']
+            recipe['missing'] = match['missing']
+        return paginator.get_paginated_response(data)
 
     @action(
         methods=['post'],
@@ -130,29 +228,31 @@ class RecipeViewSet(CustomRecipeViewSet):
     @action(methods=['get'],
             detail=False,
             permission_classes=(IsAuthenticated,),
+            content_negotiation_class=ExportContentNegotiation,
             url_path='download_shopping_cart')
     def download_ingredient_list(self, request):
         user = request.user
-        if not user.shopping_cart:
+        if not user.shopping_cart.exists():
             return Response(
-                {'errors': 'Пользователь не добавил в корзину'
+                {'errors': 'Пользователь не добавил в корзину '
                            'ни одного рецепта.'},
                 status=HTTP_400_BAD_REQUEST
             )
-        ingredients = RecipeIngredientRelations.objects.filter(
-            recipe__shopping_cart__user=user
-        ).values(
+        export_format = request.query_params.get('format', 'txt')
+        exporter_class = EXPORTERS.get(export_format)
+        if exporter_class is None:
+            return Response(
+                {'errors': 'Формат выгрузки не поддерживается. Доступные '
+                           'форматы: ' + ', '.join(EXPORTERS) + '.'},
+                status=HTTP_400_BAD_REQUEST
+            )
+        totals = ShoppingCartTotal.objects.filter(user=user)
+        etag = shopping_list_etag(totals, export_format)
+        if etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+            return HttpResponseNotModified()
+        ingredients = totals.values(
             'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-        ingredient_list = 'Ингредиенты для избранных рецептов:\n\n'
-        for ingredient in ingredients:
-            item = (f'~ {ingredient["ingredient__name"]} - '
-                    f'{ingredient["amount"]} '
-                    f'({ingredient["ingredient__measurement_unit"]})\n\n'
-                    )
-            ingredient_list += item
-        footer = 'Foodgram 2023\nХороших покупок!'
-        ingredient_list += footer
-        return HttpResponse(ingredient_list,
-                            content_type='text/plain;charset=UTF-8')
+            'ingredient__measurement_unit',
+            'amount'
+        ).order_by('ingredient__name')
+        return exporter_class(ingredients).response(etag)
@@ -5,7 +5,8 @@ from users.models import Subscription, User
 
 
 class UserAdmin(ModelAdmin):
-    list_display = ('username', 'email', 'first_name', 'last_name')
+    list_display = ('username', 'email', 'first_name', 'last_name',
+                    'recipes_count', 'followers_count')
     list_filter = ('email', 'username')
 
 
@@ -37,6 +37,14 @@ class User(AbstractUser):
         max_length=10,
         choices=ROLE,
         default=USER)
+    recipes_count = models.PositiveIntegerField(
+        'Количество рецептов',
+        default=0,
+        editable=False)
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+        editable=False)
 
     @property
     def is_user(self):
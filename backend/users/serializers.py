@@ -6,12 +6,20 @@ from rest_framework.serializers import (ModelSerializer, SerializerMethodField,
                                         ValidationError)
 
 import recipes.serializers
-from recipes.models import Recipe
-from users.models import Subscription
+from recipes.viewer import get_viewer_state
 
 User = get_user_model()
 
 
+def get_recipes_limit(request):
+    """Возвращает recipes_limit из запроса или None, если он не задан."""
+    try:
+        recipes_limit = int(request.GET.get('recipes_limit'))
+    except (TypeError, ValueError):
+        return None
+    return recipes_limit if recipes_limit > 0 else None
+
+
 class CustomUserCreateSerializer(UserCreateSerializer):
     """Кастомный сериализатор для создания Пользователя."""
     class Meta:
@@ -56,11 +64,7 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        return user.is_authenticated and Subscription.objects.filter(
-            user=user.id,
-            author=obj
-        ).exists()
+        return get_viewer_state(self.context).is_subscribed(obj.id)
 
 
 class FollowSerializer(ModelSerializer):
@@ -84,18 +88,16 @@ class FollowSerializer(ModelSerializer):
         read_only_fields = ('email', 'username', 'first_name', 'last_name')
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        return user.is_authenticated and Subscription.objects.filter(
-            user=user.id,
-            author=obj
-        ).exists()
+        return get_viewer_state(self.context).is_subscribed(obj.id)
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit')
-        queryset = obj.recipes.all()
-        if recipes_limit:
-            queryset = queryset[:int(recipes_limit)]
+        if hasattr(obj, 'limited_recipes'):
+            queryset = obj.limited_recipes
+        else:
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            queryset = obj.recipes.all()
+            if recipes_limit:
+                queryset = queryset[:recipes_limit]
         serializers = recipes.serializers.RecipeAnotherSerializer(
             queryset,
             many=True,
@@ -104,4 +106,4 @@ class FollowSerializer(ModelSerializer):
         return serializers.data
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj).count()
+        return obj.recipes_count
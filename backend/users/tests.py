@@ -0,0 +1,23 @@
+from recipes.tests import QueryCountTestCase
+
+
+class SubscriptionQueryCountTests(QueryCountTestCase):
+    """Число запросов списка подписок не зависит от размера страницы."""
+    def test_subscriptions(self):
+        for limit in (1, 3):
+            with self.subTest(limit=limit):
+                response = self.assert_queries(
+                    8,
+                    f'/api/users/subscriptions/?limit={limit}'
+                    '&recipes_limit=2'
+                )
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_subscriptions_cursor(self):
+        for limit in (1, 3):
+            with self.subTest(limit=limit):
+                self.assert_queries(
+                    7,
+                    '/api/users/subscriptions/?pagination=cursor'
+                    f'&limit={limit}&recipes_limit=2'
+                )
@@ -1,4 +1,5 @@
 from django.contrib.auth import get_user_model
+from django.db.models import Prefetch, prefetch_related_objects
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet
 from rest_framework.decorators import action
@@ -7,24 +8,49 @@ from rest_framework.response import Response
 from rest_framework.status import (HTTP_201_CREATED, HTTP_204_NO_CONTENT,
                                    HTTP_400_BAD_REQUEST)
 
+from recipes.mixins import ConditionalResponseMixin, CursorPaginationMixin
+from recipes.models import Recipe
 from users.models import Subscription
-from users.serializers import CustomUserSerializer, FollowSerializer
+from users.serializers import (CustomUserSerializer, FollowSerializer,
+                               get_recipes_limit)
 
 User = get_user_model()
 
 
-class UserFollowViewSet(UserViewSet):
+class UserFollowViewSet(ConditionalResponseMixin,
+                        CursorPaginationMixin,
+                        UserViewSet):
     """
     Вьюсет для модели Пользователя с обработкой запросов
     на создание и удаление подписки.
     """
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
+    cache_models = ('user',)
+
+    def get_etag_models(self):
+        if self.action == 'subscriptions':
+            return ('user', 'recipe')
+        return self.cache_models
 
     @action(detail=False, permission_classes=(IsAuthenticated,))
     def subscriptions(self, request):
+        return self.conditional(self.list_subscriptions, request)
+
+    def list_subscriptions(self, request):
         follows = User.objects.filter(following__user=request.user)
         pages = self.paginate_queryset(follows)
+        recipes_limit = get_recipes_limit(request)
+        recipes = Recipe.objects.all()
+        if recipes_limit:
+            recipes = recipes.limit_per_author(
+                (author.id for author in pages),
+                recipes_limit
+            )
+        prefetch_related_objects(
+            pages,
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+        )
         serializer = FollowSerializer(
             pages,
             many=True,